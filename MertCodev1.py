@@ -1,88 +1,112 @@
 
+import heapq
+import json
+import os
+import re
+import tempfile
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+import requests
 import yfinance as yf
-import random
-from typing import List, Dict, Tuple, Any
+from types import MappingProxyType
+from typing import List, Dict, Tuple, Any, Optional, Callable, Mapping, NamedTuple
 
 # =========================================================================
 # 1. GLOBAL CONSTANTS AND DEFINITIONS
 # =========================================================================
 
+def _frozen(mapping: Dict) -> Mapping:
+    """Read-only view of a (nested) dict, so shared lookup tables cannot be mutated"""
+    return MappingProxyType({k: _frozen(v) if isinstance(v, dict) else v for k, v in mapping.items()})
+
 # Risk level names
-RISK_LEVEL_NAME = {
+RISK_LEVEL_NAME = _frozen({
     1: "Defensive",
     2: "Conservative",
     3: "Balanced",
     4: "Growth Tilt",
     5: "Aggressive"
-}
+})
 
 # Risk level labels for UI
-tick_labels = {
+tick_labels = _frozen({
     1: "Defensive",
     2: "Conservative",
     3: "Balanced",
     4: "Growth Tilt",
     5: "Aggressive"
-}
+})
 
 # Define the asset classes
 ASSET_CLASSES = ["bonds", "etf", "stocks"]
 
 # Predefined asset universe per region and asset class
-ASSET_UNIVERSE: Dict[str, Dict[str, List[str]]] = {
+ASSET_UNIVERSE: Mapping[str, Mapping[str, Tuple[str, ...]]] = _frozen({
     "Europe": {
-        "etf": [
+        "etf": (
             "IESG.L", "IUSK.DE", "IUSK.F", "IESE.AS", "IDSE.AS",
             "IEUR", "VWCE.DE", "EXW1.DE", "DBX1.DE", "CSP1.L",
             "XESC.DE", "SXR8.DE", "EUNL.DE", "IWDA.AS", "EUN2.DE"
-        ],
-        "bonds": [
+        ),
+        "bonds": (
             "GRNB.L", "EMB", "AGGG.L", "USAG.SW", "BGRN",
             "EBND.DE", "EUNA.DE", "BND", "AGG", "XG7S.DE",
             "IBCI.DE", "IBGS.DE", "XDWD.DE", "VETY.DE", "DBEF.DE"
-        ],
-        "stocks": [
+        ),
+        "stocks": (
             "ORSTED.CO", "ADS.DE", "PHIA.AS", "SIE.DE", "SAP.DE",
             "ASML.AS", "LIN.DE", "NOVO-B.CO", "OR.PA", "AD.AS",
             "NESN.SW", "VIV.PA", "BMW.DE", "SHEL.L", "SU.TO"
-        ]
+        )
     },
     "North America": {
-        "etf": [
+        "etf": (
             "SUSA", "ESGV", "SPYL.DE", "SPY", "QQQ",
             "VTI", "IVV", "DIA", "IWM", "XLF",
             "XLK", "XLV", "VOO", "CSP1.L", "IWDA.AS"
-        ],
-        "bonds": [
+        ),
+        "bonds": (
             "BGRN", "USAG.SW", "IGSB", "SJNK", "AGG",
             "BND", "TLT", "LQD", "HYG", "BNDX",
             "MBB", "TIP", "SHY", "EMB", "SPDR_BRE"
-        ],
-        "stocks": [
+        ),
+        "stocks": (
             "AAPL", "MSFT", "ADBE", "CRM", "JNJ",
             "AMZN", "GOOGL", "JPM", "XOM", "TSLA",
             "BRK-B", "META", "NVDA", "PG", "UNH"
-        ]
+        )
     },
     "Emerging Markets": {
-        "etf": [
+        "etf": (
             "ESGE", "EEMX", "EEM", "VWO", "IEMG",
             "EMQQ", "SCHE", "XMME.DE", "EEMS", "EMXC",
             "HMEF.L", "EMB", "VWOB", "IGOV", "PCY"
-        ],
-        "bonds": [
+        ),
+        "bonds": (
             "HYGD", "EMBB", "IGOV", "EMLC", "EMHY",
             "ILTB", "EMB", "VWOB", "SCHP", "TIP",
             "BGRN", "AGG", "BND", "TLT", "LQD"
-        ],
-        "stocks": [
+        ),
+        "stocks": (
             "TSM", "BABA", "INFY.NS", "TCS.NS", "VALE3.SA",
             "NIO", "HDFCBANK.NS", "TCEHY", "005930.KS", "601318.SS",
             "ITUB", "PBR", "MTN", "SU.TO", "GOLD"
-        ]
+        )
     }
-}
+})
+
+# Universe across all regions per asset class, for region "Any"
+_FLAT_UNIVERSE = _frozen({
+    # dict.fromkeys drops tickers listed under several regions, keeping first-seen order
+    cls: tuple(dict.fromkeys(chain.from_iterable(classes[cls] for classes in ASSET_UNIVERSE.values())))
+    for cls in ASSET_CLASSES
+})
 
 # Primary ETF mapping per region & risk_level
 REGION_RISK_ETF: Dict[str, Dict[int, Tuple[str, str]]] = {
@@ -110,7 +134,7 @@ REGION_RISK_ETF: Dict[str, Dict[int, Tuple[str, str]]] = {
 }
 
 # Risk profile weights & filters
-RISK_PROFILE = {
+RISK_PROFILE = _frozen({
     1: {"weights": {"ev_ebitda":35,"fcf_yield":35,"volatility":20,"esgScore":10,"dividend_yield":0},
         "filters": {"ev_ebitda":(None,15),"volatility":(None,0.20)}},
     2: {"weights": {"ev_ebitda":30,"fcf_yield":30,"volatility":20,"esgScore":20,"dividend_yield":0},
@@ -121,7 +145,7 @@ RISK_PROFILE = {
         "filters": {"ev_ebitda":(None,25),"volatility":(None,0.35)}},
     5: {"weights": {"ev_ebitda":15,"fcf_yield":35,"volatility":25,"esgScore":25,"dividend_yield":0},
         "filters": {"ev_ebitda":(None,None),"volatility":(None,0.40)}}
-}
+})
 
 # ESG base scores for regions and asset classes
 ESG_BASE_SCORES = {
@@ -211,426 +235,904 @@ QUESTIONNAIRE = [
     {"id":14,"text":"Would you consider investing with borrowed money to achieve higher returns?","options":["No, definitely not","Only if an expert recommends it","Yes, I can imagine doing that"]}
 ]
 
+# Numeric metrics collected per ticker, in column order of the metrics table
+METRIC_KEYS = ("ev_ebitda", "fcf_yield", "volatility", "esgScore", "dividend_yield")
+
+class MetricRecord(NamedTuple):
+    """Metrics fetched for one ticker, fields after the ticker in METRIC_KEYS order (None = missing)"""
+    ticker: str
+    ev_ebitda: Optional[float]
+    fcf_yield: Optional[float]
+    volatility: Optional[float]
+    esgScore: Optional[float]
+    dividend_yield: Optional[float]
+    # Product name and sector from the same info record, for PRODUCT_INFO
+    longName: Optional[str] = None
+    sector: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> "MetricRecord":
+        """Build a record from a metrics dict"""
+        return cls(item.get("ticker"), *(item.get(k) for k in METRIC_KEYS))
+
+# Maximum number of tickers fetched from Yahoo Finance at the same time
+FETCH_CONCURRENCY = 24
+
+# Yahoo request budget shared by all threads (sustained rate and burst size)
+YAHOO_REQUESTS_PER_SEC = 10
+YAHOO_BURST = 20
+
+# Retries for throttled (429) or failing (5xx) Yahoo requests, with exponential backoff
+HTTP_RETRIES = 3
+BACKOFF_BASE = 0.5          # seconds
+BACKOFF_MAX = 10.0          # seconds
+
+# On-disk cache for Yahoo Finance data (fundamentals change at most daily)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+INFO_TTL = 24 * 60 * 60     # seconds
+HISTORY_TTL = 60 * 60       # seconds
+
+# Yahoo's spark endpoint returns daily closes for up to 20 symbols per request
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v8/finance/spark"
+SPARK_BATCH_SIZE = 20
+
+# Symbols per yf.download() call when the spark endpoint misses some tickers
+DOWNLOAD_BATCH_SIZE = 10
+
+# Yahoo's quote endpoint returns basic fields for up to 100 symbols per request
+YAHOO_QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+QUOTE_BATCH_SIZE = 100
+
+# Yahoo's quoteSummary endpoint returns every INFO_FIELDS value for one symbol in a single JSON call
+YAHOO_SUMMARY_URL = "https://query2.finance.yahoo.com/v10/finance/quoteSummary/{}"
+SUMMARY_FIELDS = {
+    "enterpriseValue": ("defaultKeyStatistics", "enterpriseValue"),
+    "ebitda": ("financialData", "ebitda"),
+    "freeCashflow": ("financialData", "freeCashflow"),
+    "marketCap": ("summaryDetail", "marketCap"),
+    "dividendYield": ("summaryDetail", "dividendYield"),
+    "longName": ("price", "longName"),
+    "sector": ("assetProfile", "sector"),
+}
+SUMMARY_MODULES = ",".join(sorted({module for module, _ in SUMMARY_FIELDS.values()}))
+
+# Quote types that have no company fundamentals (EV, EBITDA, free cash flow)
+FUND_QUOTE_TYPES = ("ETF", "MUTUALFUND")
+
+# Fields of yf.Ticker.info that the recommendation engine actually uses
+INFO_FIELDS = ("enterpriseValue", "ebitda", "freeCashflow", "marketCap",
+               "dividendYield", "esgScore", "longName", "sector")
+
+# Questionnaire lookups by question id
+_BY_ID = {q["id"]: q for q in QUESTIONNAIRE}
+_OPT_COUNT = {q["id"]: len(q["options"]) - 1 for q in QUESTIONNAIRE}
+
 # =========================================================================
 # 2. USER PROFILE FUNCTIONS
 # =========================================================================
 
+# The profile functions below are pure in the answers, and generate_recommendation and the
+# app call them repeatedly for the same answers, so they are memoized on this key
+def answers_key(answers) -> Tuple[Tuple[int, int], ...]:
+    """Hashable form of an answers dict, sorted by question id"""
+    return tuple(sorted(answers.items()))
+
+@lru_cache(maxsize=256)
+def _profile_items(key) -> Tuple[Tuple[int, str], ...]:
+    """(question id, chosen option) pairs for the valid answers in an answers key"""
+    return tuple((qid, _BY_ID[qid]["options"][answer_index]) for qid, answer_index in key
+                 if qid in _BY_ID and 0 <= answer_index <= _OPT_COUNT[qid])
+
 def map_answers_to_profile(a):
     """Creates a human-readable profile from questionnaire answers"""
-    profile = {}
-    for q in QUESTIONNAIRE:
-        qid = q["id"]
-        if qid in a:
-            answer_index = a[qid]
-            options = q["options"]
-            if 0 <= answer_index < len(options):
-                profile[qid] = options[answer_index]
-    return profile
+    return dict(_profile_items(answers_key(a)))
 
-def derive_risk_level(a):
-    """Calculate risk level using basic 5 questions (original method)"""
-    required_keys = [1, 2, 4, 7, 8]
-    if not all(k in a for k in required_keys):
-        return 3  # Default to balanced if incomplete
+def answers_to_array(answers) -> np.ndarray:
+    """Encode an answers dict as an int8 array indexed by question id (-1 = unanswered)"""
+    arr = np.full(len(QUESTIONNAIRE), -1, dtype=np.int8)
+    for qid, answer_index in answers.items():
+        arr[qid] = answer_index
+    return arr
 
-    # Weighted calculation based on key questions
-    w = {1: 0.20, 2: 0.30, 4: 0.20, 7: 0.15, 8: 0.15}
-    s1, s2, s4, s7, s8 = a[1]/4, a[2]/4, a[4]/4, a[7]/4, a[8]/3
-    comp = s1*w[1] + s2*w[2] + s4*w[4] + s7*w[7] + s8*w[8]
+# Key questions for the base risk level and their weights
+_RL_WEIGHTS = {1: 0.20, 2: 0.30, 4: 0.20, 7: 0.15, 8: 0.15}
+_RL_KEYS = list(_RL_WEIGHTS)
+_RL_SHAPE = tuple(_OPT_COUNT[i] + 1 for i in _RL_KEYS)
 
-    if comp < 0.20: return 1
-    if comp < 0.40: return 2
-    if comp < 0.60: return 3
-    if comp < 0.80: return 4
-    return 5
+# Composite score at which each risk level above 1 starts
+_RL_THRESHOLDS = np.array([0.20, 0.40, 0.60, 0.80])
 
-def enhanced_derive_risk_level(answers):
-    """Calculate risk level using more questionnaire answers for better accuracy"""
-    # Start with base calculation from original 5 questions
-    base_risk = derive_risk_level(answers)
-    
+def _weighted_risk_levels(cols: np.ndarray) -> np.ndarray:
+    """Risk level ladder for complete key answers (one column per question in _RL_KEYS)"""
+    comp = sum((cols[:, j] / _OPT_COUNT[i]) * _RL_WEIGHTS[i] for j, i in enumerate(_RL_KEYS))
+    return 1 + np.searchsorted(_RL_THRESHOLDS, comp, side="right")
+
+# Risk level for every combination of key answers, indexed by the packed answers
+_RL_LUT = _weighted_risk_levels(np.indices(_RL_SHAPE).reshape(len(_RL_KEYS), -1).T).astype(np.uint8)
+
+def derive_risk_levels(ans: np.ndarray) -> np.ndarray:
+    """Calculate risk levels for a batch of encoded answers (rows from answers_to_array)"""
+    cols = np.atleast_2d(ans)[:, _RL_KEYS]
+    complete = (cols >= 0).all(axis=1)
+    levels = _RL_LUT[np.ravel_multi_index(cols.T, _RL_SHAPE, mode="clip")]
+    return np.where(complete, levels, 3)  # Default to balanced if incomplete
+
+# Risk level adjustments from the extra questions, by answer index
+_RISK_ADJUSTMENTS = {
+    3: {0: -1.0, 1: -0.5, 3: 0.5},  # Reaction to losses: sell everything / sell some / buy more
+    10: {0: -0.5},                  # Anticipated major expenses
+    12: {0: -0.5, 3: 0.5},          # Underperformance reaction: sell immediately / buy more
+    14: {0: -0.2, 2: 0.5}           # Leverage comfort: definitely not / can imagine doing that
+}
+# One entry per option plus a trailing 0.0, which index -1 (unanswered) picks up
+_RISK_ADJUSTMENT_TABLES = {
+    qid: np.array([adj.get(i, 0.0) for i in range(_OPT_COUNT[qid] + 1)] + [0.0])
+    for qid, adj in _RISK_ADJUSTMENTS.items()
+}
+
+def enhanced_derive_risk_levels(ans: np.ndarray) -> np.ndarray:
+    """Calculate risk levels for a batch of encoded answers using the extra questions"""
+    ans = np.atleast_2d(ans)
     # Start with base risk level as a float to allow finer adjustments
-    adjusted_risk = float(base_risk)
-    
-    # Reaction to losses (Q3) - Significant impact on true risk tolerance
-    if 3 in answers:
-        reaction = answers[3]
-        if reaction == 0:  # "Sell everything"
-            adjusted_risk -= 1.0  # Much lower risk tolerance
-        elif reaction == 1:  # "Sell some"
-            adjusted_risk -= 0.5  # Somewhat lower risk tolerance
-        elif reaction == 3:  # "Buy more"
-            adjusted_risk += 0.5  # Higher risk tolerance
-    
-    # Anticipated major expenses (Q10)
-    if 10 in answers and answers[10] == 0:  # Yes to major expenses
-        adjusted_risk -= 0.5  # Need more conservative approach
-    
-    # Underperformance reaction (Q12)
-    if 12 in answers:
-        reaction = answers[12]
-        if reaction == 0:  # "Sell immediately"
-            adjusted_risk -= 0.5  # Lower risk tolerance
-        elif reaction == 3:  # "Buy more"
-            adjusted_risk += 0.5  # Higher risk tolerance
-    
-    # Leverage comfort (Q14)
-    if 14 in answers:
-        leverage = answers[14]
-        if leverage == 0:  # "No, definitely not"
-            adjusted_risk -= 0.2  # More conservative
-        elif leverage == 2:  # "Yes, I can imagine doing that"
-            adjusted_risk += 0.5  # More aggressive
-    
+    adjusted_risk = derive_risk_levels(ans).astype(float)
+
+    # Adjust for loss reactions, expenses and leverage comfort (see _RISK_ADJUSTMENTS)
+    for qid, table in _RISK_ADJUSTMENT_TABLES.items():
+        adjusted_risk += table[ans[:, qid]]
+
     # Clamp between 1-5 and round to nearest integer
-    return max(1, min(5, round(adjusted_risk)))
+    return np.clip(np.rint(adjusted_risk), 1, 5).astype(int)
 
-def calculate_dynamic_allocation(answers):
-    """Generate dynamic asset allocation based on questionnaire answers"""
+@lru_cache(maxsize=256)
+def _risk_levels(key) -> Tuple[int, int]:
+    """(basic, enhanced) risk level for an answers key"""
+    ans = answers_to_array(dict(key))
+    return int(derive_risk_levels(ans)[0]), int(enhanced_derive_risk_levels(ans)[0])
+
+def derive_risk_level(a):
+    """Calculate risk level using basic 5 questions (original method)"""
+    return _risk_levels(answers_key(a))[0]
+
+def enhanced_derive_risk_level(answers):
+    """Calculate risk level using more questionnaire answers for better accuracy"""
+    return _risk_levels(answers_key(answers))[1]
+
+# Array positions of the asset classes (ASSET_CLASSES order) and metrics (METRIC_KEYS order)
+BONDS, ETF, STOCKS = (ASSET_CLASSES.index(c) for c in ("bonds", "etf", "stocks"))
+EV_EBITDA, FCF_YIELD, VOLATILITY, ESG_SCORE, DIVIDEND_YIELD = range(len(METRIC_KEYS))
+
+# Base allocations - every risk level has some exposure to each asset class (bonds, etf, stocks)
+_BASE_ALLOCATIONS = {
+    1: np.array([0.80, 0.15, 0.05]),  # Mostly bonds
+    2: np.array([0.60, 0.30, 0.10]),  # Conservative
+    3: np.array([0.40, 0.40, 0.20]),  # True balance
+    4: np.array([0.20, 0.50, 0.30]),  # Growth tilt
+    5: np.array([0.10, 0.40, 0.50])   # Aggressive but diversified
+}
+
+def dynamic_allocation_vector(answers) -> np.ndarray:
+    """Dynamic asset allocation as an array in ASSET_CLASSES order"""
+    return _allocation_vector(answers_key(answers)).copy()
+
+@lru_cache(maxsize=256)
+def _allocation_vector(key) -> np.ndarray:
+    """Read-only dynamic allocation for an answers key"""
+    answers = dict(key)
     # Start with base allocation from risk level
     risk_level = derive_risk_level(answers)
-    
-    # Base allocations - every risk level has some exposure to each asset class
-    base_allocations = {
-        1: {"bonds": 0.80, "etf": 0.15, "stocks": 0.05},  # Mostly bonds
-        2: {"bonds": 0.60, "etf": 0.30, "stocks": 0.10},  # Conservative
-        3: {"bonds": 0.40, "etf": 0.40, "stocks": 0.20},  # True balance
-        4: {"bonds": 0.20, "etf": 0.50, "stocks": 0.30},  # Growth tilt
-        5: {"bonds": 0.10, "etf": 0.40, "stocks": 0.50}   # Aggressive but diversified
-    }
-    
-    allocation = base_allocations[risk_level].copy()
+    allocation = _BASE_ALLOCATIONS[risk_level].copy()
     
     # Modify based on investment objective (Q0)
     if 0 in answers:
         objective = answers[0]
         if objective == 0:  # Wealth accumulation
-            allocation["stocks"] += 0.05
-            allocation["bonds"] -= 0.05
+            allocation[STOCKS] += 0.05
+            allocation[BONDS] -= 0.05
         elif objective == 1:  # Regular income
             # Increase bonds for income
-            allocation["bonds"] += 0.05
-            allocation["stocks"] -= 0.05
+            allocation[BONDS] += 0.05
+            allocation[STOCKS] -= 0.05
         elif objective == 2:  # Capital preservation
-            allocation["bonds"] += 0.10
-            allocation["stocks"] -= 0.10
+            allocation[BONDS] += 0.10
+            allocation[STOCKS] -= 0.10
             
     # Adjust for liquidity needs (Q5)
     if 5 in answers:
         liquidity = answers[5]
         if liquidity == 0:  # Very important
-            allocation["bonds"] += 0.10
-            allocation["stocks"] -= 0.10
+            allocation[BONDS] += 0.10
+            allocation[STOCKS] -= 0.10
         elif liquidity == 3:  # Not important at all
-            allocation["stocks"] += 0.05
-            allocation["bonds"] -= 0.05
+            allocation[STOCKS] += 0.05
+            allocation[BONDS] -= 0.05
     
     # Adjust for investment experience (Q6)
     if 6 in answers:
         experience = answers[6]
         if experience == 0:  # No experience
             # Reduce stocks for beginners
-            allocation["stocks"] = max(0, allocation["stocks"] - 0.10)
-            allocation["etf"] += 0.10
+            allocation[STOCKS] = max(0, allocation[STOCKS] - 0.10)
+            allocation[ETF] += 0.10
         elif experience == 2:  # Regular investor
             # Can handle more direct stocks
-            allocation["stocks"] = min(0.60, allocation["stocks"] + 0.05)
-            allocation["etf"] -= 0.05
+            allocation[STOCKS] = min(0.60, allocation[STOCKS] + 0.05)
+            allocation[ETF] -= 0.05
     
     # Adjust for reaction to losses (Q3)
     if 3 in answers:
         reaction = answers[3]
         if reaction == 0:  # "Sell everything"
-            allocation["bonds"] += 0.10
-            allocation["stocks"] -= 0.10
+            allocation[BONDS] += 0.10
+            allocation[STOCKS] -= 0.10
         elif reaction == 3:  # "Buy more"
-            allocation["stocks"] += 0.05
-            allocation["bonds"] -= 0.05
+            allocation[STOCKS] += 0.05
+            allocation[BONDS] -= 0.05
     
     # Adjust for major expenses (Q10)
     if 10 in answers and answers[10] == 0:  # Yes to major expenses
-        allocation["bonds"] += 0.10
-        allocation["stocks"] -= 0.10
+        allocation[BONDS] += 0.10
+        allocation[STOCKS] -= 0.10
     
     # Ensure no negative allocations
-    for asset in allocation:
-        allocation[asset] = max(0, allocation[asset])
+    np.maximum(allocation, 0, out=allocation)
     
     # Normalize to ensure allocations sum to 1.0
-    total = sum(allocation.values())
+    total = allocation.sum()
     if total > 0:  # Avoid division by zero
-        for asset in allocation:
-            allocation[asset] /= total
+        allocation /= total
     
+    allocation.setflags(write=False)
     return allocation
 
+def calculate_dynamic_allocation(answers):
+    """Generate dynamic asset allocation based on questionnaire answers"""
+    return dict(zip(ASSET_CLASSES, dynamic_allocation_vector(answers).tolist()))
+
 def get_allowed_allocations(a):
     """Get allowed allocations based on the complete user profile"""
-    # Use dynamic allocation instead of fixed
-    alloc = calculate_dynamic_allocation(a)
-    
+    return dict(zip(ASSET_CLASSES, _allowed_allocations(answers_key(a))))
+
+@lru_cache(maxsize=256)
+def _allowed_allocations(key) -> Tuple[float, ...]:
+    """Allowed allocation per asset class (ASSET_CLASSES order) for an answers key"""
+    a = dict(key)
     # Special case for very short-term investors (< 1 year)
     if a.get(1) == 0:
-        return {"bonds":1.0,"etf":0.0,"stocks":0.0}
+        return (1.0, 0.0, 0.0)
+    
+    # Use dynamic allocation instead of fixed
+    alloc = dynamic_allocation_vector(a)
     
     # Adjust for investment experience
     if a.get(6, 99) <= 0:  # No investment experience
         # Remove stocks entirely for complete beginners
-        alloc["stocks"] = 0.0
+        alloc[STOCKS] = 0.0
         # Normalize the remaining allocation
-        s = alloc["bonds"] + alloc["etf"]
+        s = alloc[BONDS] + alloc[ETF]
         if s > 0:
-            alloc["bonds"] /= s
-            alloc["etf"] /= s
+            alloc[[BONDS, ETF]] /= s
     elif a.get(6, 99) <= 1:  # Limited experience
         # Reduce stocks but don't eliminate
-        alloc["stocks"] /= 2
+        alloc[STOCKS] /= 2
         # Increase ETFs to compensate
-        alloc["etf"] += alloc["stocks"]
+        alloc[ETF] += alloc[STOCKS]
         # Normalize
-        s = sum(alloc.values())
+        s = alloc.sum()
         if s > 0:
-            for asset in alloc:
-                alloc[asset] /= s
+            alloc /= s
     
-    return alloc
+    return tuple(alloc.tolist())
 
-def adjust_scoring_weights(answers, risk_level):
-    """Adjust scoring weights based on questionnaire answers"""
+def scoring_weight_vector(answers, risk_level) -> np.ndarray:
+    """Scoring weights adjusted to the questionnaire answers, as an array in METRIC_KEYS order"""
+    return _scoring_weights(answers_key(answers), risk_level).copy()
+
+@lru_cache(maxsize=256)
+def _scoring_weights(key, risk_level) -> np.ndarray:
+    """Read-only adjusted scoring weights for an answers key and risk level"""
+    answers = dict(key)
     # Start with standard weights from risk profile
-    weights = RISK_PROFILE[risk_level]["weights"].copy()
+    weights = _WEIGHTS_ARR[risk_level].copy()
     
     # Modify based on investment objective (Q0)
     if 0 in answers:
         objective = answers[0]
         if objective == 0:  # Wealth accumulation
             # Favor growth metrics
-            weights["ev_ebitda"] -= 5
-            weights["fcf_yield"] += 5
+            weights[EV_EBITDA] -= 5
+            weights[FCF_YIELD] += 5
         elif objective == 1:  # Regular income
             # Add dividend yield weight
-            weights["dividend_yield"] = 15
-            weights["ev_ebitda"] -= 5
-            weights["fcf_yield"] -= 10
+            weights[DIVIDEND_YIELD] = 15
+            weights[EV_EBITDA] -= 5
+            weights[FCF_YIELD] -= 10
         elif objective == 2:  # Capital preservation
             # Favor stability
-            weights["volatility"] += 10
-            weights["ev_ebitda"] -= 5
-            weights["fcf_yield"] -= 5
+            weights[VOLATILITY] += 10
+            weights[EV_EBITDA] -= 5
+            weights[FCF_YIELD] -= 5
     
     # Adjust for ESG interest (Q13)
     if 13 in answers:
         if answers[13] == 0:  # Yes to ESG
-            weights["esgScore"] = min(50, weights.get("esgScore", 0) + 10)
+            weights[ESG_SCORE] = min(50, weights[ESG_SCORE] + 10)
             # Reduce other metrics to keep total reasonable
             total_reduction = 10
-            for metric in ["ev_ebitda", "fcf_yield", "volatility"]:
-                weights[metric] = max(5, weights[metric] - (total_reduction // 3))
-    
-    # Normalize to ensure weights sum to 100
-    total = sum(weights.values())
-    for metric in weights:
-        weights[metric] = round(weights[metric] * 100 / total)
+            reduced = [EV_EBITDA, FCF_YIELD, VOLATILITY]
+            weights[reduced] = np.maximum(5, weights[reduced] - (total_reduction // 3))
     
+    # Normalize to ensure weights sum to 100 (np.rint rounds half to even, like round)
+    total = weights.sum()
+    weights *= 100
+    weights /= total
+    np.rint(weights, out=weights)
+    weights.setflags(write=False)
     return weights
 
+def adjust_scoring_weights(answers, risk_level):
+    """Adjust scoring weights based on questionnaire answers"""
+    weights = scoring_weight_vector(answers, risk_level)
+    return {k: int(w) for k, w in zip(METRIC_KEYS, weights)}
+
 # =========================================================================
-# 3. INVESTMENT RECOMMENDATION FUNCTIONS
+# 3. MARKET DATA CACHE
 # =========================================================================
 
-def get_esg_score_for_ticker(ticker, region, asset_class):
-    """Get region and class-specific ESG scores with realistic variation"""
+class FileCache:
+    """JSON file cache storing one timestamped payload per ticker and entry name"""
+
+    def __init__(self, root: str):
+        self.root = root
+        # Entries already read or written by this process, so repeat lookups skip the disk
+        self._memory: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, ticker: str, name: str) -> str:
+        return os.path.join(self.root, ticker, f"{name}.json")
+
+    def get(self, ticker: str, name: str, ttl: float) -> Optional[Any]:
+        """Return the cached payload, or None if missing, expired or from a previous day"""
+        key = (ticker, name)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            try:
+                with open(self._path(ticker, name), "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+            except (OSError, ValueError):
+                return None
+            entry = (raw.get("ts", 0), raw.get("payload"))
+            with self._lock:
+                self._memory[key] = entry
+        ts, payload = entry
+        if time.time() - ts >= ttl or date.fromtimestamp(ts) != date.today():
+            return None
+        return payload
+
+    def set(self, ticker: str, name: str, payload: Any) -> None:
+        """Store a payload; failures are reported but never interrupt a recommendation"""
+        ts = time.time()
+        with self._lock:
+            self._memory[(ticker, name)] = (ts, payload)
+        path = self._path(ticker, name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see partial JSON
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"ts": ts, "payload": payload}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Error writing cache for {ticker}: {str(e)}")
+
+_CACHE = FileCache(CACHE_DIR)
+
+# Random source for the realistic score variation
+_RNG = np.random.default_rng()
+
+# yf.Ticker objects keep the data they already downloaded, so build one per symbol
+_TICKER_CACHE: Dict[str, yf.Ticker] = {}
+
+def yf_ticker(sym: str) -> yf.Ticker:
+    """Get the shared yf.Ticker object for a symbol"""
+    tk = _TICKER_CACHE.get(sym)
+    if tk is None:
+        tk = _TICKER_CACHE.setdefault(sym, yf.Ticker(sym))
+    return tk
+
+# Requests currently running, shared by concurrent callers asking for the same data
+_INFLIGHT: Dict[Tuple[str, str], Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def coalesced(op: str, symbol: str, fetch: Callable[[], Any]) -> Any:
+    """Run fetch() once for all concurrent callers of the same (op, symbol)"""
+    key = (op, symbol)
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = _INFLIGHT[key] = Future()
+    if not is_owner:
+        return future.result()
+
+    try:
+        result = fetch()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
+def get_ticker_info(t: str) -> Dict[str, Any]:
+    """Get the used subset of yf.Ticker.info, served from the disk cache when fresh"""
+    def fetch():
+        # Another caller may have finished this fetch between our cache miss and now
+        info = _CACHE.get(t, "info", INFO_TTL)
+        if info is not None:
+            return info
+        info = fetch_quote_summary(t)
+        if info is None:
+            _YAHOO_LIMITER.acquire()
+            full_info = yf_ticker(t).get_info() or {}
+            info = {k: full_info.get(k) for k in INFO_FIELDS}
+        _CACHE.set(t, "info", info)
+        return info
+
+    info = _CACHE.get(t, "info", INFO_TTL)
+    if info is None:
+        info = coalesced("info", t, fetch)
+    return info
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket so no thread sends anything for `seconds` (e.g. after a 429)"""
+        with self.lock:
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+_YAHOO_LIMITER = TokenBucket(YAHOO_REQUESTS_PER_SEC, YAHOO_BURST)
+
+# Pooled HTTP session for the Yahoo endpoints queried directly
+_HTTP = requests.Session()
+_HTTP.headers["User-Agent"] = "Mozilla/5.0"
+# One kept-alive connection per worker thread; the default pool of 10 would keep
+# discarding and re-handshaking connections under FETCH_CONCURRENCY workers
+_HTTP.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=2, pool_maxsize=FETCH_CONCURRENCY))
+
+def _retry_delay(resp: Optional[requests.Response], attempt: int) -> float:
+    """Seconds to wait before retrying: the server's Retry-After, else jittered exponential backoff"""
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * _RNG.uniform(0.5, 1.0)
+
+def yahoo_get(url: str, params: Dict[str, str]) -> requests.Response:
+    """GET a Yahoo endpoint within the rate limit, retrying timeouts, 429 and 5xx responses"""
+    for attempt in range(HTTP_RETRIES + 1):
+        _YAHOO_LIMITER.acquire()
+        try:
+            resp = _HTTP.get(url, params=params, timeout=10)
+        except requests.Timeout:
+            if attempt == HTTP_RETRIES:
+                raise
+            resp = None
+        else:
+            if (resp.status_code != 429 and resp.status_code < 500) or attempt == HTTP_RETRIES:
+                return resp
+            if resp.status_code == 429:
+                # Throttling applies to all our threads, so hold them all back, not just this one;
+                # the acquire() at the top of the next attempt does the waiting
+                _YAHOO_LIMITER.pause(_retry_delay(resp, attempt))
+                continue
+        time.sleep(_retry_delay(resp, attempt))
+
+# Worker threads for blocking Yahoo calls, shared by every batch
+_IO_EXECUTOR = ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY, thread_name_prefix="yahoo-io")
+
+def fetch_spark_closes(tickers: List[str]) -> Dict[str, List[float]]:
+    """Get 3 months of daily closes with one spark request per SPARK_BATCH_SIZE symbols"""
+    closes = {}
+    for i in range(0, len(tickers), SPARK_BATCH_SIZE):
+        chunk = tickers[i:i + SPARK_BATCH_SIZE]
+        try:
+            resp = yahoo_get(YAHOO_SPARK_URL, {
+                "symbols": ",".join(chunk), "range": "3mo", "interval": "1d"})
+            resp.raise_for_status()
+            data = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error fetching spark data: {str(e)}")
+            continue
+        for t in chunk:
+            series = (data.get(t) or {}).get("close") or []
+            values = [float(c) for c in series if c is not None]
+            if values:
+                closes[t] = values
+    return closes
+
+# Set once the quote endpoint refuses us, so later batches go straight to get_info()
+_QUOTE_DISABLED = threading.Event()
+
+def fetch_quotes(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Get Yahoo quote records with one request per QUOTE_BATCH_SIZE symbols"""
+    quotes = {}
+    for i in range(0, len(tickers), QUOTE_BATCH_SIZE):
+        if _QUOTE_DISABLED.is_set():
+            break
+        chunk = tickers[i:i + QUOTE_BATCH_SIZE]
+        try:
+            resp = yahoo_get(YAHOO_QUOTE_URL, {"symbols": ",".join(chunk)})
+            if resp.status_code in (401, 403):
+                # Yahoo wants a session crumb for this endpoint; fall back to per-ticker info
+                print(f"Quote endpoint unavailable (HTTP {resp.status_code}), using per-ticker info")
+                _QUOTE_DISABLED.set()
+                break
+            resp.raise_for_status()
+            results = resp.json()["quoteResponse"]["result"]
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            print(f"Error fetching quotes: {str(e)}")
+            continue
+        for q in results:
+            if q.get("symbol"):
+                quotes[q["symbol"]] = q
+    return quotes
+
+# Set once the quoteSummary endpoint refuses us, so later tickers go straight to get_info()
+_SUMMARY_DISABLED = threading.Event()
+
+def fetch_quote_summary(t: str) -> Optional[Dict[str, Any]]:
+    """Get the INFO_FIELDS record from one quoteSummary request, or None to fall back to get_info()"""
+    if _SUMMARY_DISABLED.is_set():
+        return None
+    try:
+        resp = yahoo_get(YAHOO_SUMMARY_URL.format(t), {"modules": SUMMARY_MODULES})
+        if resp.status_code in (401, 403):
+            print(f"quoteSummary endpoint unavailable (HTTP {resp.status_code}), using get_info()")
+            _SUMMARY_DISABLED.set()
+            return None
+        resp.raise_for_status()
+        result = resp.json()["quoteSummary"]["result"][0]
+    except (requests.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+        print(f"Error fetching quoteSummary for {t}: {str(e)}")
+        return None
+
+    info = dict.fromkeys(INFO_FIELDS)
+    for field, (module, key) in SUMMARY_FIELDS.items():
+        value = (result.get(module) or {}).get(key)
+        # Numbers come wrapped as {"raw": 1.23, "fmt": "1.23"}; strings come bare
+        info[field] = value.get("raw") if isinstance(value, dict) else value
+    return info
+
+def prefetch_fund_info(tickers: List[str]) -> None:
+    """Fill the info cache for funds from batched quotes, so they need no get_info() call"""
+    missing = [t for t in tickers if _CACHE.get(t, "info", INFO_TTL) is None]
+    if not missing:
+        return
+    for t, q in fetch_quotes(missing).items():
+        # Equities still go through get_info() for their fundamentals
+        if q.get("quoteType") not in FUND_QUOTE_TYPES:
+            continue
+        info = dict.fromkeys(INFO_FIELDS)
+        info["marketCap"] = q.get("marketCap")
+        info["dividendYield"] = q.get("trailingAnnualDividendYield")  # Fraction, like info
+        info["longName"] = q.get("longName")
+        _CACHE.set(t, "info", info)
+
+def download_close_histories(tickers: List[str]) -> Dict[str, List[float]]:
+    """Download 3 months of daily closes from spark, falling back to yf.download, and cache them"""
+    histories = fetch_spark_closes(tickers)
+    for t, closes in histories.items():
+        _CACHE.set(t, "hist_3mo", closes)
+    missing = [t for t in tickers if t not in histories]
+
+    # Fall back to yfinance for anything the spark endpoint did not return
+    for i in range(0, len(missing), DOWNLOAD_BATCH_SIZE):
+        chunk = missing[i:i + DOWNLOAD_BATCH_SIZE]
+        try:
+            _YAHOO_LIMITER.acquire()
+            data = yf.download(chunk, period="3mo", interval="1d", actions=False,
+                               threads=True, progress=False)
+            close = data["Close"]
+            if not hasattr(close, "columns"):  # Older yfinance returns a Series for one ticker
+                close = close.to_frame(chunk[0])
+            for t in chunk:
+                if t not in close.columns:
+                    continue
+                closes = close[t].dropna().to_numpy(dtype=float).tolist()
+                if closes:
+                    histories[t] = closes
+                    _CACHE.set(t, "hist_3mo", closes)
+        except Exception as e:
+            print(f"Error downloading price history: {str(e)}")
+    return histories
+
+def get_close_histories(tickers: List[str]) -> Dict[str, List[float]]:
+    """Get 3 months of daily closes per ticker from the disk cache or batched downloads"""
+    histories = {}
+    missing = []
+    for t in tickers:
+        closes = _CACHE.get(t, "hist_3mo", HISTORY_TTL)
+        if closes is None:
+            missing.append(t)
+        else:
+            histories[t] = closes
+
+    # Users with the same profile miss the same tickers, so they share one download
+    if missing:
+        histories.update(coalesced("hist_3mo", ",".join(missing),
+                                   lambda: download_close_histories(missing)))
+    return histories
+
+def annualized_volatilities(histories: List[List[float]]) -> np.ndarray:
+    """Annualized standard deviation of daily returns for every close series at once"""
+    length = max((len(h) for h in histories), default=0)
+    prices = np.full((length, len(histories)), np.nan)
+    for j, closes in enumerate(histories):
+        prices[:len(closes), j] = closes
+
+    # One column per ticker; shorter histories are padded with NaN and ignored
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = prices[1:] / prices[:-1] - 1
+    valid = np.isfinite(returns)
+    counts = valid.sum(axis=0)
+    returns = np.where(valid, returns, 0.0)
+    mean = returns.sum(axis=0) / np.maximum(counts, 1)
+    sq_dev = np.where(valid, (returns - mean) ** 2, 0.0).sum(axis=0)
+    vols = np.sqrt(sq_dev / np.maximum(counts - 1, 1)) * np.sqrt(252)
+    vols[counts < 2] = np.nan
+    return vols
+
+# =========================================================================
+# 4. INVESTMENT RECOMMENDATION FUNCTIONS
+# =========================================================================
+
+# Ticker name fragments that mark a sustainability-focused product
+_ESG_NAME_RE = re.compile(r"ESG|SRI|SDG|GREEN|SUST")
+
+@lru_cache(maxsize=None)
+def _esg_base(ticker, region, asset_class) -> Tuple[float, bool, bool]:
+    """Deterministic part of the ESG score: (base score, is a known ticker, has an ESG name)"""
     # Check if a predefined score exists for this ticker
     if ticker in ESG_KNOWN_TICKERS:
-        base_score = ESG_KNOWN_TICKERS[ticker]
-        # Add small variation for realism
-        return base_score * random.uniform(0.95, 1.05)
+        return ESG_KNOWN_TICKERS[ticker], True, False
     
-    # Otherwise use region-specific base value
+    # Otherwise use region-specific base value, noting any ESG prefix in the ticker name
     base_score = ESG_BASE_SCORES.get(region, {}).get(asset_class, 50)
-    
+    return base_score, False, _ESG_NAME_RE.search(ticker) is not None
+
+def esg_default_scores(tickers, region, asset_class) -> np.ndarray:
+    """Region and class-specific ESG scores with realistic variation for many tickers at once"""
+    base_score, known, esg_named = (np.array(col) for col in
+                                    zip(*(_esg_base(t, region, asset_class) for t in tickers)))
+    base_score = base_score.astype(float)
+    n = len(base_score)
+
     # Consider ESG prefix in ticker name
-    if any(esg_prefix in ticker for esg_prefix in ["ESG", "SRI", "SDG", "GREEN", "SUST"]):
-        base_score += 15 * random.uniform(0.9, 1.1)
-    
-    # Random variation for realism, but more variation for unknown tickers
-    variation = random.uniform(0.85, 1.15)
-    
-    # Limit score to 0-100
-    return min(100, max(0, base_score * variation))
+    base_score += np.where(esg_named, 15 * _RNG.uniform(0.9, 1.1, size=n), 0.0)
 
-def fetch_batch_metrics(tickers: List[str]) -> List[Dict[str, Any]]:
-    """Fetch financial metrics for a list of tickers"""
-    results = []
-    for t in tickers:
-        try:
-            tk = yf.Ticker(t)
-            info = tk.info
-            
-            ev, ebitda = info.get("enterpriseValue"), info.get("ebitda")
-            ev_ebitda = ev/ebitda if ev and ebitda else None
-            
-            fcf, mcap = info.get("freeCashflow"), info.get("marketCap")
-            fcf_yield = fcf/mcap if fcf and mcap else None
-            
-            # Get dividend yield
-            div_yield = info.get("dividendYield", None)
-            if div_yield is not None:
-                div_yield = div_yield * 100  # Convert to percentage
-            
-            try:
-                hist = tk.history(period="3mo", interval="1d")["Close"].pct_change().dropna()
-                vol = hist.std()*(252**0.5)
-            except Exception as e:
-                print(f"Error getting volatility for {t}: {str(e)}")
-                vol = None
-            
-            # Get ESG score: First check if known ticker, else from API
-            esg_score = ESG_KNOWN_TICKERS.get(t, info.get("esgScore"))
-            
-            results.append({
-                "ticker": t,
-                "ev_ebitda": ev_ebitda,
-                "fcf_yield": fcf_yield,
-                "volatility": vol,
-                "esgScore": esg_score,
-                "dividend_yield": div_yield
-            })
-        except Exception as e:
-            print(f"Error fetching data for {t}: {str(e)}")
-            # Still add the ticker but with missing metrics
-            # This will be handled by the scoring function
-            results.append({
-                "ticker": t,
-                "ev_ebitda": None,
-                "fcf_yield": None,
-                "volatility": None,
-                "esgScore": get_esg_score_for_ticker(t, None, None),
-                "dividend_yield": None
-            })
-        time.sleep(0.1)
-    return results
+    # Random variation for realism: small for known tickers, more for unknown ones (limited to 0-100)
+    unknown = np.clip(base_score * _RNG.uniform(0.85, 1.15, size=n), 0, 100)
+    return np.where(known, base_score * _RNG.uniform(0.95, 1.05, size=n), unknown)
 
-def apply_filters(items, filters):
-    """Apply filters to list of items based on metric thresholds"""
-    def ok(it):
-        for k,(mn,mx) in filters.items():
-            v=it.get(k)
-            if v is None: continue
-            if (mn is not None and v<mn) or (mx is not None and v>mx): return False
-        return True
-    return [it for it in items if ok(it)]
+def get_esg_score_for_ticker(ticker, region, asset_class):
+    """Get region and class-specific ESG scores with realistic variation"""
+    return float(esg_default_scores([ticker], region, asset_class)[0])
 
-def score_item(item, weights, region=None, asset_class=None):
-    """Score an investment item based on risk profile weights and region/class defaults"""
-    ev = item.get("ev_ebitda")
-    fcf = item.get("fcf_yield")
-    vol = item.get("volatility")
-    esg = item.get("esgScore")
-    div = item.get("dividend_yield")
-    ticker = item.get("ticker")
-
-    # Region and asset class specific default values for missing data
-    if ev is None or ev <= 0:
-        # Region-specific EV/EBITDA defaults
-        if region == "Europe":
-            ev = 18 * random.uniform(0.9, 1.1)
-        elif region == "North America":
-            ev = 20 * random.uniform(0.9, 1.1)
-        elif region == "Emerging Markets":
-            ev = 22 * random.uniform(0.9, 1.1)
-        else:
-            ev = 20 * random.uniform(0.9, 1.1)
-    
-    if fcf is None:
-        # Asset class specific FCF yield defaults
-        if asset_class == "bonds":
-            fcf = 0.015 * random.uniform(0.9, 1.1)
-        elif asset_class == "etf":
-            fcf = 0.02 * random.uniform(0.9, 1.1)
-        elif asset_class == "stocks":
-            fcf = 0.03 * random.uniform(0.9, 1.1)
-        else:
-            fcf = 0.02 * random.uniform(0.9, 1.1)
-    
-    if vol is None:
-        # Region-specific and asset class specific volatility standards
-        base_vol = 0.3
-        region_factor = 1.0
-        asset_factor = 1.0
+def fetch_ticker_metrics(t: str, vol: Optional[float] = None) -> MetricRecord:
+    """Fetch financial metrics for a single ticker, given its precomputed volatility"""
+    try:
+        info = get_ticker_info(t)
         
-        if region == "Europe":
-            region_factor = 0.9  # European markets tend to be less volatile
-        elif region == "North America":
-            region_factor = 1.0  # Baseline
-        elif region == "Emerging Markets":
-            region_factor = 1.2  # Emerging markets tend to be more volatile
+        ev, ebitda = info.get("enterpriseValue"), info.get("ebitda")
+        ev_ebitda = ev/ebitda if ev and ebitda else None
         
-        if asset_class == "bonds":
-            asset_factor = 0.7  # Bonds less volatile
-        elif asset_class == "etf":
-            asset_factor = 1.0  # Baseline
-        elif asset_class == "stocks":
-            asset_factor = 1.3  # Individual stocks more volatile
+        fcf, mcap = info.get("freeCashflow"), info.get("marketCap")
+        fcf_yield = fcf/mcap if fcf and mcap else None
         
-        vol = base_vol * region_factor * asset_factor * random.uniform(0.9, 1.1)
-    
-    # Dividend yield defaults
-    if div is None:
-        if asset_class == "bonds":
-            div = 3.0 * random.uniform(0.9, 1.1)  # Bonds typically have higher yields
-        elif asset_class == "etf":
-            div = 2.0 * random.uniform(0.9, 1.1)  # ETFs have moderate yields
-        elif asset_class == "stocks":
-            # Region-specific yield expectations
-            if region == "Europe":
-                div = 3.0 * random.uniform(0.9, 1.1)  # European stocks often have higher dividends
-            elif region == "North America":
-                div = 1.5 * random.uniform(0.9, 1.1)  # US stocks have moderate dividends
-            elif region == "Emerging Markets":
-                div = 2.5 * random.uniform(0.9, 1.1)  # Emerging markets vary widely
-            else:
-                div = 2.0 * random.uniform(0.9, 1.1)
-        else:
-            div = 2.0 * random.uniform(0.9, 1.1)
-    
+        # Get dividend yield
+        div_yield = info.get("dividendYield", None)
+        if div_yield is not None:
+            div_yield = div_yield * 100  # Convert to percentage
+        
+        # Get ESG score: First check if known ticker, else from API
+        esg_score = ESG_KNOWN_TICKERS.get(t, info.get("esgScore"))
+        
+        return MetricRecord(t, ev_ebitda, fcf_yield, vol, esg_score, div_yield,
+                            info.get("longName"), info.get("sector"))
+    except Exception as e:
+        print(f"Error fetching data for {t}: {str(e)}")
+        # Still add the ticker but with missing metrics
+        # This will be handled by the scoring function
+        return MetricRecord(t, None, None, None, get_esg_score_for_ticker(t, None, None), None)
+
+def fetch_batch_metrics(tickers: List[str], filters=None) -> List[MetricRecord]:
+    """Fetch financial metrics for a list of tickers, skipping those the volatility filter rejects"""
+    tickers = list(tickers)
+
+    # Volatility for the whole universe from a single price download
+    histories = get_close_histories(tickers)
+    vols = annualized_volatilities([histories.get(t, []) for t in tickers])
+    vols = [float(v) if np.isfinite(v) else None for v in vols]
+
+    # apply_filters would drop these anyway, so don't spend info requests on them
+    if filters is not None:
+        lo, hi = filter_bounds(filters)[VOLATILITY]
+        keep = [i for i, v in enumerate(vols) if v is None or lo <= v <= hi]
+        tickers = [tickers[i] for i in keep]
+        vols = [vols[i] for i in keep]
+
+    # Funds get everything they need from the batched quotes
+    prefetch_fund_info(tickers)
+
+    # The Yahoo requests are I/O bound, so overlapping them on the shared pool makes the
+    # batch take roughly as long as the slowest ticker; the pool size caps concurrency
+    return list(_IO_EXECUTOR.map(fetch_ticker_metrics, tickers, vols))
+
+# Record fields up to this index are the ticker and METRIC_KEYS values
+_METRICS_END = 1 + len(METRIC_KEYS)
+
+def as_record(item) -> MetricRecord:
+    """Return a metric record as is, converting a metrics dict to one"""
+    return MetricRecord.from_dict(item) if isinstance(item, Mapping) else item
+
+def metrics_table(items) -> np.ndarray:
+    """Pack metric records (or metrics dicts) into an (N, len(METRIC_KEYS)) float matrix (NaN = missing)"""
+    # None converts to NaN in a float array
+    return np.array([as_record(it)[1:_METRICS_END] for it in items], dtype=float).reshape(-1, len(METRIC_KEYS))
+
+def filter_bounds(filters) -> np.ndarray:
+    """Turn a {metric: (min, max)} filter dict into a (len(METRIC_KEYS), 2) array, None = unbounded"""
+    if isinstance(filters, np.ndarray):
+        return filters
+    bounds = np.empty((len(METRIC_KEYS), 2))
+    for j, k in enumerate(METRIC_KEYS):
+        mn, mx = filters.get(k, (None, None))
+        bounds[j] = (-np.inf if mn is None else mn, np.inf if mx is None else mx)
+    return bounds
+
+def weight_vector(weights) -> np.ndarray:
+    """Turn a {metric: weight} dict into an array in METRIC_KEYS order"""
+    if isinstance(weights, np.ndarray):
+        return weights
+    return np.array([weights.get(k, 0) for k in METRIC_KEYS], dtype=float)
+
+# Risk profile filters and weights in array form, built once at import
+_FILTER_BOUNDS = {rl: filter_bounds(cfg["filters"]) for rl, cfg in RISK_PROFILE.items()}
+_WEIGHTS_ARR = {rl: weight_vector(cfg["weights"]) for rl, cfg in RISK_PROFILE.items()}
+
+def filter_checks(filters) -> Tuple[Tuple[int, float, float], ...]:
+    """(column, min, max) for each metric with a finite bound, the only ones that can reject items"""
+    if isinstance(filters, tuple):
+        return filters
+    return tuple((j, lo, hi) for j, (lo, hi) in enumerate(filter_bounds(filters).tolist())
+                 if np.isfinite(lo) or np.isfinite(hi))
+
+# The risk profiles only bound a couple of metrics, so their checks are resolved once here
+_FILTER_CHECKS = {rl: filter_checks(bounds) for rl, bounds in _FILTER_BOUNDS.items()}
+
+def filter_mask(metrics: np.ndarray, filters) -> np.ndarray:
+    """Boolean mask of the metrics_table rows that pass the filters (dict, bounds array or checks)"""
+    keep = np.ones(len(metrics), dtype=bool)
+    for j, lo, hi in filter_checks(filters):
+        col = metrics[:, j]
+        # Comparisons with NaN are False, so missing metrics never filter an item out
+        if lo > -np.inf:
+            keep &= ~(col < lo)
+        if hi < np.inf:
+            keep &= ~(col > hi)
+    return keep
+
+def apply_filters(items, filters):
+    """Apply filters (dict or filter_bounds array) to list of items based on metric thresholds"""
+    if not items:
+        return []
+    return [items[i] for i in np.flatnonzero(filter_mask(metrics_table(items), filters))]
+
+# Typical metric values used when data is missing, by region and asset class
+_DEFAULT_EV_EBITDA = {"Europe": 18, "North America": 20, "Emerging Markets": 22}
+_DEFAULT_FCF_YIELD = {"bonds": 0.015, "etf": 0.02, "stocks": 0.03}
+_VOL_REGION_FACTOR = {"Europe": 0.9, "North America": 1.0, "Emerging Markets": 1.2}  # EM more volatile
+_VOL_ASSET_FACTOR = {"bonds": 0.7, "etf": 1.0, "stocks": 1.3}  # Bonds less, single stocks more volatile
+_DEFAULT_DIV_YIELD = {"bonds": 3.0, "etf": 2.0}  # Bonds typically have higher yields
+_DEFAULT_STOCK_DIV_YIELD = {"Europe": 3.0, "North America": 1.5, "Emerging Markets": 2.5}
+
+@lru_cache(maxsize=None)
+def default_metrics(region=None, asset_class=None) -> np.ndarray:
+    """Region and asset class specific default metrics in METRIC_KEYS order (ESG is per ticker)"""
+    if asset_class == "stocks":
+        div = _DEFAULT_STOCK_DIV_YIELD.get(region, 2.0)
+    else:
+        div = _DEFAULT_DIV_YIELD.get(asset_class, 2.0)
+    defaults = np.array([
+        _DEFAULT_EV_EBITDA.get(region, 20),
+        _DEFAULT_FCF_YIELD.get(asset_class, 0.02),
+        0.3 * _VOL_REGION_FACTOR.get(region, 1.0) * _VOL_ASSET_FACTOR.get(asset_class, 1.0),
+        np.nan,
+        div
+    ])
+    defaults.flags.writeable = False  # Shared through the cache
+    return defaults
+
+def fill_default_metrics(items, region=None, asset_class=None, metrics=None) -> np.ndarray:
+    """Metric matrix for items, with region/class defaults (+/-10% variation) for missing data"""
+    # A metrics_table of the items can be passed in to be filled in place
+    if metrics is None:
+        metrics = metrics_table(items)
+    missing = np.isnan(metrics)
+    missing[:, EV_EBITDA] |= metrics[:, EV_EBITDA] <= 0  # Non-positive multiples are meaningless
+    defaults = _RNG.uniform(0.9, 1.1, size=metrics.shape)
+    defaults *= default_metrics(region, asset_class)
+    np.copyto(metrics, defaults, where=missing)
+
     # Improved ESG score calculation
-    if esg is None:
-        esg = get_esg_score_for_ticker(ticker, region, asset_class)
+    rows = np.flatnonzero(missing[:, ESG_SCORE])
+    if rows.size:
+        tickers = [as_record(items[i]).ticker for i in rows]
+        metrics[rows, ESG_SCORE] = esg_default_scores(tickers, region, asset_class)
+    return metrics
+
+# Each metric is scored as clip((x - lo) / span, 0, 1), in METRIC_KEYS order:
+# EV/EBITDA 20 -> 5, FCF yield 0 -> 10%, volatility 50% -> 10%, ESG 0 -> 100, dividend 0 -> 5%
+_NORM_LO = np.array([20.0, 0.0, 0.5, 0.0, 0.0])
+_NORM_SPAN = np.array([-15.0, 0.10, -0.4, 100.0, 5.0])
 
-    # Scoring formulas
-    score_ev = max(0, min(1, (20 - ev) / 15))
-    score_fcf = max(0, min(1, fcf / 0.10))
-    score_vol = max(0, min(1, (0.5 - vol) / 0.4))
-    score_esg = max(0, min(1, esg / 100))
-    score_div = max(0, min(1, div / 5.0))  # Score of 1 for 5% yield or higher
+def score_batch(metrics: np.ndarray, lo: np.ndarray, span: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """Clamp-normalize an (N, K) metric matrix column-wise and return its weighted row sums"""
+    normalized = metrics - lo
+    normalized /= span
+    np.clip(normalized, 0, 1, out=normalized)
+    return normalized @ w
+
+def score_items(items, weights, region=None, asset_class=None, metrics=None) -> np.ndarray:
+    """Score all investment items at once based on risk profile weights and region/class defaults"""
+    metrics = fill_default_metrics(items, region, asset_class, metrics)
+    weight_vec = weight_vector(weights)
 
     # Regional score adjustments
-    region_modifier = 1.0
-    if region == "Europe":
-        region_modifier = 1.0 + (random.uniform(-0.05, 0.05))
-    elif region == "North America":
-        region_modifier = 1.0 + (random.uniform(-0.05, 0.05))
-    elif region == "Emerging Markets":
-        region_modifier = 1.0 + (random.uniform(-0.05, 0.05))
-
-    # Calculate total score with all available metrics
-    total_score = (
-        score_ev * weights.get("ev_ebitda", 0) +
-        score_fcf * weights.get("fcf_yield", 0) +
-        score_vol * weights.get("volatility", 0) +
-        score_esg * weights.get("esgScore", 0) +
-        score_div * weights.get("dividend_yield", 0)
-    ) / 100 * region_modifier
-
-    return total_score
+    if region in ("Europe", "North America", "Emerging Markets"):
+        region_modifier = _RNG.uniform(0.95, 1.05, size=len(items))
+    else:
+        region_modifier = 1.0
+
+    # Calculate total score with all available metrics (weights are percentages)
+    scores = score_batch(metrics, _NORM_LO, _NORM_SPAN, weight_vec / 100)
+    scores *= region_modifier
+    return scores
+
+def score_item(item, weights, region=None, asset_class=None):
+    """Score an investment item based on risk profile weights and region/class defaults"""
+    return float(score_items([as_record(item)], weights, region, asset_class)[0])
 
 def get_user_universe(region, asset_class, esg_only):
     """Get appropriate asset universe based on user preferences"""
     if region=="Any":
-        full = sum((ASSET_UNIVERSE[r][asset_class] for r in ASSET_UNIVERSE),[])
+        full = _FLAT_UNIVERSE.get(asset_class, ())
     else:
-        full = ASSET_UNIVERSE.get(region,{}).get(asset_class,[])
+        full = ASSET_UNIVERSE.get(region,{}).get(asset_class,())
     return full[:5] if esg_only else full
 
 def get_region_risk_etf(region, rl):
@@ -640,26 +1142,39 @@ def get_region_risk_etf(region, rl):
     p,t=REGION_RISK_ETF[region][rl]
     return {"profile":p,"ticker":t}
 
-def map_user_to_recommendations(region, asset_class, risk_level, esg_only, answers=None):
-    """Generate recommendations based on user profile"""
+def map_user_to_recommendations(region, asset_class, risk_level, esg_only, answers=None, top_n=None,
+                                metrics=None):
+    """Generate recommendations based on user profile, best first (only the top_n if given)"""
     try:
         tks = get_user_universe(region, asset_class, esg_only)
-        raw = fetch_batch_metrics(tks)
+        if metrics is None:
+            raw = fetch_batch_metrics(tks, _FILTER_BOUNDS[risk_level])
+        else:
+            # Prefetched by fetch_batch_metrics, so absent tickers failed the volatility filter
+            raw = [metrics[t] for t in tks if t in metrics]
         
         # If answers provided, use custom weights
         if answers:
-            custom_weights = adjust_scoring_weights(answers, risk_level)
-            cfg = RISK_PROFILE[risk_level].copy()
-            cfg["weights"] = custom_weights
+            weights = scoring_weight_vector(answers, risk_level)
         else:
-            cfg = RISK_PROFILE[risk_level]
+            weights = _WEIGHTS_ARR[risk_level]
             
-        flt = apply_filters(raw, cfg["filters"])
+        # Pack the metrics once: the same rows are filtered, default-filled and scored
+        table = metrics_table(raw)
+        keep = np.flatnonzero(filter_mask(table, _FILTER_CHECKS[risk_level]))
+        flt = [raw[i] for i in keep]
         
-        for it in flt:
-            it["score"] = score_item(it, cfg["weights"], region, asset_class)
+        scores = score_items(flt, weights, region, asset_class, table[keep])
         
-        return sorted(flt, key=lambda x: x["score"], reverse=True)
+        if top_n is not None and len(scores) > top_n:
+            # Partial sort: pick the top_n in O(N), then order just those
+            idx = np.argpartition(-scores, top_n - 1)[:top_n]
+            idx = idx[np.lexsort((idx, -scores[idx]))]
+        else:
+            # Stable sort keeps the universe order for equal scores
+            idx = np.argsort(-scores, kind="stable")
+        # Only the returned picks become (mutable) dicts
+        return [dict(flt[i]._asdict(), score=float(scores[i])) for i in idx]
     except Exception as e:
         print(f"Error in recommendations for {region}/{asset_class}: {str(e)}")
         # Return a default recommendation if there's an error
@@ -675,9 +1190,109 @@ def map_user_to_recommendations(region, asset_class, risk_level, esg_only, answe
         }]
 
 # =========================================================================
-# 4. MAIN RECOMMENDATION FUNCTION
+# 5. MAIN RECOMMENDATION FUNCTION
 # =========================================================================
 
+def lookup_product_info(ticker, asset_class) -> Tuple[str, str]:
+    """Get a product's (name, type) from its Yahoo info, served from the disk cache when fresh"""
+    try:
+        info = get_ticker_info(ticker)
+        return info.get("longName") or ticker, info.get("sector") or asset_class.capitalize()
+    except Exception:
+        return ticker, asset_class.capitalize()
+
+def _warm_up_universe() -> None:
+    """Fetch every universe ticker's metrics into the caches and name it in PRODUCT_INFO"""
+    for cls, tickers in _FLAT_UNIVERSE.items():
+        try:
+            for rec in fetch_batch_metrics(tickers):
+                if rec.longName or rec.sector:
+                    PRODUCT_INFO.setdefault(rec.ticker, (rec.longName or rec.ticker,
+                                                         rec.sector or cls.capitalize()))
+        except Exception as e:
+            print(f"Error warming up {cls} data: {str(e)}")
+
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_THREAD: Optional[threading.Thread] = None
+
+def start_warm_up() -> None:
+    """Prefetch the fixed universe in a background thread, once per process"""
+    global _WARMUP_THREAD
+    with _WARMUP_LOCK:
+        if _WARMUP_THREAD is None:
+            _WARMUP_THREAD = threading.Thread(target=_warm_up_universe, name="yahoo-warmup", daemon=True)
+            _WARMUP_THREAD.start()
+
+def region_recommendations(region, classes, alloc, rl, esg_only, ans, metrics) -> List[Dict[str, Any]]:
+    """Pick a region's recommendations: the best product per asset class, topped up to two"""
+    region_products = []
+
+    for cls, w in classes:
+        try:
+            # Pass answers to recommendation function for customized scoring;
+            # at most the top two per class can end up in the region's picks
+            recs = map_user_to_recommendations(region, cls, rl, esg_only, ans, 2, metrics)
+            for r in recs:
+                r.update(region=region, asset_class=cls, class_weight=w,
+                         final_score=r["score"] * w)
+
+            region_products += recs
+        except Exception as e:
+            print(f"Error generating recommendations for {region}/{cls}: {str(e)}")
+            # Add a fallback recommendation if needed
+            if not region_products and cls == "etf":  # Only add fallback for ETFs
+                default_etf = REGION_RISK_ETF[region][rl][1]
+                region_products.append({
+                    "ticker": default_etf,
+                    "region": region,
+                    "asset_class": cls,
+                    "class_weight": w,
+                    "score": 0.5,
+                    "final_score": 0.5 * w,
+                    "esgScore": ESG_BASE_SCORES.get(region, {}).get(cls, 50),
+                    "dividend_yield": None
+                })
+
+    # Make sure we have at least one recommendation per region
+    if region_products:
+        # Ensure diversity in asset types within each region
+        # Group by asset class
+        by_asset_class = {}
+        for prod in region_products:
+            asset_class = prod["asset_class"]
+            if asset_class not in by_asset_class:
+                by_asset_class[asset_class] = []
+            by_asset_class[asset_class].append(prod)
+        
+        # Get top product from each asset class with allocation > 0
+        top_region_recs = []
+        for asset_class, products in by_asset_class.items():
+            if products and alloc.get(asset_class, 0) > 0:
+                top_in_class = max(products, key=itemgetter("score"))
+                top_region_recs.append(top_in_class)
+        
+        # If we still need more, add second-best products
+        if len(top_region_recs) < 2 and region_products:
+            picked = {id(p) for p in top_region_recs}
+            remaining = [p for p in region_products if id(p) not in picked]
+            top_region_recs.extend(heapq.nlargest(2 - len(top_region_recs), remaining,
+                                                  key=itemgetter("final_score")))
+        
+        return top_region_recs
+    else:
+        # Add a default recommendation if we couldn't get any valid ones
+        default_etf = REGION_RISK_ETF[region][3][1]  # Use balanced risk level as fallback
+        return [{
+            "ticker": default_etf,
+            "region": region,
+            "asset_class": "etf",
+            "class_weight": 1.0,
+            "score": 0.5,
+            "final_score": 0.5,
+            "esgScore": ESG_BASE_SCORES.get(region, {}).get("etf", 50),
+            "dividend_yield": None
+        }]
+
 def generate_recommendation(ans):
     """Generate personalized investment recommendations"""
     try:
@@ -692,86 +1307,32 @@ def generate_recommendation(ans):
 
         combined = []
 
-        for region in ["Europe", "North America", "Emerging Markets"]:
-            region_products = []
+        # Skip very small allocations, but keep more diversity
+        classes = [(cls, w) for cls, w in alloc.items() if w > 0.05]
 
-            for cls, w in alloc.items():
-                if w <= 0.05:  # Skip very small allocations, but keep more diversity
-                    continue
+        regions = ["Europe", "North America", "Emerging Markets"]
+
+        # Tickers shared between regions/classes are fetched once, in one concurrent batch
+        universe = dict.fromkeys(t for region in regions for cls, w in classes
+                                 for t in get_user_universe(region, cls, esg_only))
+        metrics = {m.ticker: m for m in fetch_batch_metrics(universe, _FILTER_BOUNDS[rl])}
+
+        for region in regions:
+            combined += region_recommendations(region, classes, alloc, rl, esg_only, ans, metrics)
 
-                try:
-                    # Pass answers to recommendation function for customized scoring
-                    recs = map_user_to_recommendations(region, cls, rl, esg_only, ans)
-                    for r in recs:
-                        r["region"] = region
-                        r["asset_class"] = cls
-                        r["class_weight"] = w
-                        r["final_score"] = r["score"] * w
-
-                        if r["ticker"] not in PRODUCT_INFO:
-                            try:
-                                info = yf.Ticker(r["ticker"]).info
-                                long_name = info.get("longName", r["ticker"])
-                                sector = info.get("sector", cls.capitalize())
-                                PRODUCT_INFO[r["ticker"]] = (long_name, sector)
-                            except:
-                                PRODUCT_INFO[r["ticker"]] = (r["ticker"], cls.capitalize())
-
-                    region_products += recs
-                except Exception as e:
-                    print(f"Error generating recommendations for {region}/{cls}: {str(e)}")
-                    # Add a fallback recommendation if needed
-                    if not region_products and cls == "etf":  # Only add fallback for ETFs
-                        default_etf = REGION_RISK_ETF[region][rl][1]
-                        region_products.append({
-                            "ticker": default_etf,
-                            "region": region,
-                            "asset_class": cls,
-                            "class_weight": w,
-                            "score": 0.5,
-                            "final_score": 0.5 * w,
-                            "esgScore": ESG_BASE_SCORES.get(region, {}).get(cls, 50),
-                            "dividend_yield": None
-                        })
-
-            # Make sure we have at least one recommendation per region
-            if region_products:
-                # Ensure diversity in asset types within each region
-                # Group by asset class
-                by_asset_class = {}
-                for prod in region_products:
-                    asset_class = prod["asset_class"]
-                    if asset_class not in by_asset_class:
-                        by_asset_class[asset_class] = []
-                    by_asset_class[asset_class].append(prod)
-                
-                # Get top product from each asset class with allocation > 0
-                top_region_recs = []
-                for asset_class, products in by_asset_class.items():
-                    if products and alloc.get(asset_class, 0) > 0:
-                        top_in_class = sorted(products, key=lambda x: x["score"], reverse=True)[0]
-                        top_region_recs.append(top_in_class)
-                
-                # If we still need more, add second-best products
-                if len(top_region_recs) < 2 and region_products:
-                    remaining = [p for p in region_products if p not in top_region_recs]
-                    remaining = sorted(remaining, key=lambda x: x["final_score"], reverse=True)
-                    top_region_recs.extend(remaining[:2-len(top_region_recs)])
-                
-                combined += top_region_recs
+        # Name the picked products not seen before from the info their metrics came from;
+        # only the fallback ETFs, which were never fetched, need a lookup (done concurrently)
+        missing = {}
+        for r in combined:
+            t = r["ticker"]
+            if t in PRODUCT_INFO:
+                continue
+            if "longName" in r:
+                PRODUCT_INFO[t] = (r["longName"] or t, r["sector"] or r["asset_class"].capitalize())
             else:
-                # Add a default recommendation if we couldn't get any valid ones
-                default_etf = REGION_RISK_ETF[region][3][1]  # Use balanced risk level as fallback
-                combined.append({
-                    "ticker": default_etf,
-                    "region": region,
-                    "asset_class": "etf",
-                    "class_weight": 1.0,
-                    "score": 0.5,
-                    "final_score": 0.5,
-                    "esgScore": ESG_BASE_SCORES.get(region, {}).get("etf", 50),
-                    "dividend_yield": None
-                })
+                missing.setdefault(t, r["asset_class"])
+        for t, product in zip(missing, _IO_EXECUTOR.map(lookup_product_info, missing, missing.values())):
+            PRODUCT_INFO[t] = product
 
         primary = get_region_risk_etf("Europe", rl)
 
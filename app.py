@@ -1,96 +1,221 @@
 
 import streamlit as st
 import re
-import pandas as pd
-import urllib.request
+import math
+import bisect
 from dotenv import load_dotenv
 import os
+import atexit
 import smtplib
+import threading
 from email.message import EmailMessage
 from datetime import datetime
 from collections import defaultdict
-from fpdf import FPDF
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
-# Load environment variables
-load_dotenv()
+# Load environment variables once per process, not on every rerun of this script
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    """Read the .env file into os.environ"""
+    load_dotenv()
 
-# Configure OpenAI client
-from openai import OpenAI
-client = OpenAI(base_url="https://openrouter.ai/api/v1")
+load_environment()
+
+# Configure OpenAI client: no request may hang the page for long, and the SDK
+# itself retries 429/5xx responses and connection errors with backoff.
+# One client per process, so its connection pool survives Streamlit reruns;
+# openai (like fpdf) is imported on first use so the questionnaire starts faster
+@st.cache_resource(show_spinner=False)
+def get_openai_client():
+    """The process-wide OpenAI client"""
+    from openai import OpenAI, Timeout
+    openai_client = OpenAI(base_url="https://openrouter.ai/api/v1", timeout=Timeout(60.0, connect=5.0), max_retries=2)
+    atexit.register(openai_client.close)
+    return openai_client
+
+# Most API calls in flight at once across all sessions; extra callers wait for a
+# free slot instead of piling up 429s and retries at the provider
+LLM_MAX_CONCURRENCY = 8
+
+@st.cache_resource(show_spinner=False)
+def get_llm_slots():
+    """Process-wide limit on concurrent API calls"""
+    return threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+llm_slots = get_llm_slots()
+
+def chat_completion(client, **kwargs):
+    """Create a chat completion once a concurrency slot is free"""
+    with llm_slots:
+        return client.chat.completions.create(**kwargs)
+
+# Upper bounds on the generated text, in tokens (4-8 paragraphs / a 5-step list)
+EXPLANATION_MAX_TOKENS = 1200
+NEXT_STEPS_MAX_TOKENS = 400
+LLM_TEMPERATURE = 0.7
+
+# Models tried in order for the explanation
+EXPLANATION_MODELS = (
+    "deepseek/deepseek-prover-v2:free",
+    "gpt-4o-mini",
+    "claude-3-sonnet-20240229"
+)
 
 # Import the backend functions
 from MertCodev1 import (
     QUESTIONNAIRE,
     map_answers_to_profile,
     generate_full_recommendation,
+    answers_key,
     PRODUCT_INFO,   
     tick_labels,
     RISK_LEVEL_NAME,
-    ESG_BASE_SCORES
+    ESG_BASE_SCORES,
+    start_warm_up
 )
 
+# Fetch market data for the whole universe while the user fills in the questionnaire
+start_warm_up()
+
 # =========================================================================
 # 1. HELPER FUNCTIONS
 # =========================================================================
 
+# Markdown/HTML patterns stripped by clean_text_for_display, compiled once
+_PLAINTEXT_RE = re.compile(r'`?plaintext`?\.?\s*')
+_BACKTICKS_RE = re.compile(r'`+')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.+?)\*')
+_HEADER_RE = re.compile(r'#{1,6}\s+(.+)', re.MULTILINE)
+_LINK_RE = re.compile(r'\[(.+?)\]\(.+?\)')
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# Streamlit reruns clean the same stored texts again, so remember recent results
+@lru_cache(maxsize=64)
 def clean_text_for_display(text):
     """Clean text for display in UI or PDF by removing all markdown and special characters"""
     # First remove any "plaintext" prefix/markers that might appear
-    text = re.sub(r'`?plaintext`?\.?\s*', '', text)
+    text = _PLAINTEXT_RE.sub('', text)
 
-    # Remove any number of backticks
-    text = re.sub(r'`+', '', text)  
+    # Remove any number of backticks (this also unwraps inline code and code blocks)
+    text = _BACKTICKS_RE.sub('', text)
     
     # Remove markdown formatting
-    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)  # Bold
-    text = re.sub(r'\*(.+?)\*', r'\1', text)      # Italic
-    text = re.sub(r'`(.+?)`', r'\1', text)        # Code
-    text = re.sub(r'```[a-z]*\n(.+?)```', r'\1', text, flags=re.DOTALL)  # Code blocks
-    text = re.sub(r'#{1,6}\s+(.+)', r'\1', text, flags=re.MULTILINE)  # Headers
-    text = re.sub(r'\[(.+?)\]\(.+?\)', r'\1', text)  # Links
+    text = _BOLD_RE.sub(r'\1', text)    # Bold
+    text = _ITALIC_RE.sub(r'\1', text)  # Italic
+    text = _HEADER_RE.sub(r'\1', text)  # Headers
+    text = _LINK_RE.sub(r'\1', text)    # Links
     # Remove HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
+    text = _HTML_TAG_RE.sub('', text)
     # Remove backslashes
     text = text.replace('\\', '')
     return text
 
+@lru_cache(maxsize=64)
 def clean_text_for_pdf(text):
     """Clean and encode text for PDF compatibility"""
     text = clean_text_for_display(text)  # First remove markdown and special chars
     text = text.replace("–", "-").replace("—", "-")
     return text.encode("ascii", "ignore").decode()
 
+def group_by_region(recommendations):
+    """Group recommendations by region, keeping their order within each region"""
+    grouped = defaultdict(list)
+    for r in recommendations:
+        grouped[r["region"]].append(r)
+    return grouped
+
+RISK_DESCRIPTIONS = {
+    1: "a focus on preserving capital with minimal risk and moderate returns",
+    2: "a priority on safety with some attention to returns",
+    3: "a balanced approach between risk and potential returns",
+    4: "a focus on growth with acceptance of higher volatility",
+    5: "a strong emphasis on growth potential with acceptance of significant volatility"
+}
+
+# The results page reruns on every click; the answers don't change, so neither do the results
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_full_recommendation(key):
+    """generate_full_recommendation for an answers key with its recommendations grouped by region
+    and rendered as result boxes, shared across reruns and sessions"""
+    result = generate_full_recommendation(dict(key))
+    grouped = dict(group_by_region(result["recommendations"]))
+    cards_html = "".join(
+        f"<h3>🌍 {region}</h3>" + "".join(render_recommendation_card(r) for r in grouped[region])
+        for region in ["Europe", "North America", "Emerging Markets"] if region in grouped
+    )
+    return result, grouped, cards_html
+
+def profile_risk(profile):
+    """Risk level and its label for a profile, using the label stored with the results if present"""
+    risk_level = profile.get("risk_level", 3)
+    return risk_level, profile.get("risk_label") or RISK_LEVEL_NAME.get(risk_level, "Balanced")
+
 def get_risk_description(risk_level):
     """Get description for a risk level"""
-    descriptions = {
-        1: "a focus on preserving capital with minimal risk and moderate returns",
-        2: "a priority on safety with some attention to returns",
-        3: "a balanced approach between risk and potential returns",
-        4: "a focus on growth with acceptance of higher volatility",
-        5: "a strong emphasis on growth potential with acceptance of significant volatility"
-    }
-    return descriptions.get(risk_level, "a balanced approach between risk and potential returns")
+    return RISK_DESCRIPTIONS.get(risk_level, "a balanced approach between risk and potential returns")
+
+# ESG rating buckets: a score at or above a threshold moves up one label
+ESG_THRESHOLDS = (40, 60, 80)
+ESG_LABELS = ("Below Average", "Average", "Good", "Excellent")
+
+def esg_rating(score_float):
+    """Rating bucket for a numeric ESG score"""
+    return ESG_LABELS[bisect.bisect_right(ESG_THRESHOLDS, score_float)]
+
+# Overall rating buckets, same layout as the ESG ones
+RATING_THRESHOLDS = (0.2, 0.4, 0.6, 0.8)
+RATING_LABELS = ("Minimal Match", "Acceptable Match", "Good Match", "Strong Match", "Excellent Match")
+
+def rating_label(rating):
+    """Match label for an overall rating between 0 and 1"""
+    return RATING_LABELS[bisect.bisect_right(RATING_THRESHOLDS, rating)]
 
 def format_esg_score(esg_score):
     """Format ESG score to be user-friendly"""
-    if esg_score is None or str(esg_score).lower() == 'none' or str(esg_score).lower() == 'n/a':
+    # Fast path: the backend hands over plain numbers
+    if isinstance(esg_score, (int, float)) and math.isfinite(esg_score):
+        return f"{int(esg_score)}", esg_rating(esg_score)
+
+    if esg_score is None or str(esg_score).lower() in ('none', 'n/a'):
         return "N/A", "Data not available"
     
     try:
         score_float = float(esg_score)
-        if score_float >= 80:
-            rating = "Excellent"
-        elif score_float >= 60:
-            rating = "Good"
-        elif score_float >= 40:
-            rating = "Average"
-        else:
-            rating = "Below Average"
-        
-        return f"{int(score_float)}", rating
-    except:
+        return f"{int(score_float)}", esg_rating(score_float)
+    except (TypeError, ValueError, OverflowError):
         return str(esg_score), ""
 
+# HTML for one recommendation box on the results page
+RECOMMENDATION_CARD = (
+    '<div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin-bottom: 10px;">'
+    '<h4 style="margin-top: 0;">{ticker} - {name}</h4>'
+    '<p><strong>Type:</strong> {asset_type}</p>'
+    '<p><strong>ESG Score:</strong> {esg_display} <span style="font-size: 0.9em; color: #6c757d;">({esg_tooltip})</span></p>'
+    '<p><strong>Overall Rating:</strong> {rating_display}</p>'
+    '</div>'
+)
+
+def render_recommendation_card(r):
+    """Fill the recommendation box template for one recommendation"""
+    name, asset_type = PRODUCT_INFO.get(r["ticker"], ("Unknown", r["asset_class"]))
+    
+    # Improved ESG score display
+    esg_score = r.get('esgScore', 'N/A')
+    esg_display, esg_rating = format_esg_score(esg_score)
+    if esg_rating:
+        esg_display = f"{esg_display} ({esg_rating})"
+    esg_tooltip = "Data not available" if esg_display == "N/A" else "Environmental, Social, and Governance score (0-100)"
+    
+    # Format the overall rating with clear meaning
+    rating_score = r.get('final_score', 0)
+    rating_display = f"{rating_score:.2f} ({rating_label(rating_score)})"
+    
+    return RECOMMENDATION_CARD.format(ticker=r["ticker"], name=name, asset_type=asset_type,
+                                      esg_display=esg_display, esg_tooltip=esg_tooltip,
+                                      rating_display=rating_display)
+
 # =========================================================================
 # 2. EMAIL & PDF GENERATION
 # =========================================================================
@@ -101,7 +226,7 @@ EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 SMTP_SERVER = "mail.gmx.net"
 SMTP_PORT = 587
 
-def send_email_with_pdf(receiver_email, pdf_filename):
+def send_email_with_pdf(receiver_email, pdf_bytes, pdf_filename, smtp_session=None):
     """Send email with the PDF investment report attached"""
     msg = EmailMessage()
     msg["Subject"] = "Your Investment Report"
@@ -109,58 +234,116 @@ def send_email_with_pdf(receiver_email, pdf_filename):
     msg["To"] = receiver_email
     msg.set_content("Hi! Please find attached your personal investment report.")
 
-    with open(pdf_filename, "rb") as f:
-        file_data = f.read()
-        file_name = f.name
-    msg.add_attachment(file_data, maintype="application", subtype="pdf", filename=file_name)
+    msg.add_attachment(pdf_bytes, maintype="application", subtype="pdf", filename=pdf_filename)
+
+    (smtp_session or get_smtp_session()).send(msg)
+
+# Messages sent over one SMTP connection before it is replaced with a fresh one
+SMTP_MAX_MESSAGES = 100
 
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+class SMTPSession:
+    """Authenticated SMTP connection shared by all emails, reconnecting when the server drops it"""
+
+    def __init__(self):
+        self.server = None
+        self.sent = 0
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
         server.starttls()
         server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        server.send_message(msg)
+        self.server, self.sent = server, 0
 
-def explain_recommendations_with_gpt(profile, recommendations, name):
-    """Generate personalized explanation using AI with improved reliability and cleaning"""
-    risk_level = profile.get("risk_level", 3)
-    risk_label = RISK_LEVEL_NAME.get(risk_level, "Balanced")
-    
-    # Group recommendations by region
-    grouped = defaultdict(list)
-    for r in recommendations:
-        grouped[r["region"]].append(r)
-    
-    # Format recommendations for the API
-    formatted_regions = []
-    for region in ["Europe", "North America", "Emerging Markets"]:
-        if region in grouped:
-            regional_recs = [
-                f"- {r['ticker']} ({PRODUCT_INFO.get(r['ticker'], (r['ticker'], r['asset_class']))[0]}), "
-                f"Asset Type: {r['asset_class']}, "
-                f"ESG Score: {r.get('esgScore', 'N/A')}, "
-                f"Overall Rating: {r.get('final_score', 0):.2f}"
-                for r in grouped[region][:3]
-            ]
-            formatted_regions.append(f"Region {region}:\n" + "\n".join(regional_recs))
-    
-    all_formatted_recs = "\n\n".join(formatted_regions)
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPException:
+                pass
+            self.server = None
 
-    # Include profile elements in the prompt
-    profile_elements = []
-    for q_id, q_text in [(k, v["text"]) for k, v in enumerate(QUESTIONNAIRE) if k in profile]:
-        if q_id in profile:
-            profile_elements.append(f"{q_text}: {profile[q_id]}")
-    
-    profile_summary = "\n".join(profile_elements)
+    def send(self, msg):
+        with self.lock:
+            if self.sent >= SMTP_MAX_MESSAGES:
+                self.close()
+            # Servers close idle connections, either silently or with a 421 reply,
+            # so a dropped one is reopened and the send retried once
+            for attempt in range(2):
+                if self.server is None:
+                    self._connect()
+                try:
+                    self.server.send_message(msg)
+                    self.sent += 1
+                    return
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException) as e:
+                    if isinstance(e, smtplib.SMTPResponseException) and e.smtp_code != 421:
+                        raise
+                    self.close()
+                    if attempt:
+                        raise
 
-    # Prompt with clear instructions
-    prompt = f"""
+# Streamlit reruns this script on every interaction; cache_resource keeps
+# the connection and the email worker threads alive across reruns
+@st.cache_resource
+def get_smtp_session():
+    """The process-wide SMTP session"""
+    session = SMTPSession()
+    atexit.register(session.close)
+    return session
+
+@st.cache_resource
+def get_email_executor():
+    """Worker threads that send emails off the script thread"""
+    return ThreadPoolExecutor(max_workers=2)
+
+def send_email_in_background(receiver_email, pdf_bytes, pdf_filename):
+    """Queue the report email and return a Future for the send result"""
+    # Cached resources are looked up here, on the script thread, not in the worker
+    return get_email_executor().submit(send_email_with_pdf, receiver_email, pdf_bytes, pdf_filename,
+                                       get_smtp_session())
+
+def build_report(profile, recommendations, explanation_text, name, next_steps_future, grouped):
+    """Build the PDF report once the action plan is ready, returning (filename, pdf bytes)"""
+    return generate_pdf_report_with_api(profile, recommendations, explanation_text, name,
+                                        next_steps_future.result(), grouped)
+
+def build_report_in_background(profile, recommendations, explanation_text, name, next_steps_future, grouped):
+    """Queue the PDF report build and return a Future for its (filename, pdf bytes)"""
+    # Runs on the email workers: waiting for the action plan there can't starve the API workers
+    return get_email_executor().submit(build_report, profile, recommendations, explanation_text, name,
+                                       next_steps_future, grouped)
+
+@st.fragment(run_every=1)
+def wait_for_report():
+    """Poll the background report work and rerun the page as soon as a step has finished"""
+    pending = (st.session_state.report_future, st.session_state.email_future)
+    if any(future is not None and future.done() for future in pending):
+        st.rerun()
+
+# Callbacks of the report buttons; they run before the rerun of the click, which then shows the new status
+def request_report(profile, recommendations, grouped):
+    """Start building and emailing the PDF report"""
+    # Use the stored explanation rather than generating a new one; the PDF is built
+    # (after the action plan requested alongside the explanation) and sent in the background
+    st.session_state.report_future = build_report_in_background(
+        profile, recommendations, st.session_state.gpt_explanation, st.session_state.name,
+        st.session_state.next_steps_future, grouped)
+    st.session_state.email_sent = True
+
+def resend_report():
+    """Send the stored PDF report again"""
+    st.session_state.email_future = send_email_in_background(st.session_state.email, st.session_state.report_pdf,
+                                                             st.session_state.report_filename)
+
+# Prompt for the personalized explanation; only the fields in braces change per request
+EXPLANATION_PROMPT = """
 You are a friendly financial advisor helping a beginner named {name}.
 Write a comprehensive and personalized explanation for the following investment profile:
 
 Risk Level: {risk_level} – {risk_label}
-IMPORTANT: This risk level of {risk_level} must be explicitly mentioned and explained in your response.
 
-Complete Profile Information:
+Profile:
 {profile_summary}
 
 Recommended Investments:
@@ -168,7 +351,7 @@ Recommended Investments:
 
 Instructions:
 1. Start with a warm personal greeting to {name}
-2. Explain what their risk level ({risk_level} - {risk_label}) means specifically for them
+2. Explicitly mention and explain what their risk level ({risk_level} - {risk_label}) means for them
 3. Connect their investment timeframe to the recommended investments
 4. Explain how these specific recommendations match their risk/return preferences
 5. Highlight the importance of regional diversification across Europe, North America, and Emerging Markets
@@ -178,67 +361,130 @@ Instructions:
 9. End with encouragement appropriate for their experience level
 10. The entire explanation should be 4-8 paragraphs
 
-IMPORTANT FORMAT INSTRUCTIONS:
-- Use plain text only with absolutely NO formatting characters of any kind
-- Do NOT use backticks (`) anywhere in your response
-- Do NOT use markdown formatting, asterisks, or any special characters
-- Do NOT use HTML tags or any code formatting
-- Do NOT use section headers with # symbols
-- Do NOT use triple backticks (```)
+Format:
+- Plain English text only, with blank lines between paragraphs
+- No markdown, asterisks, backticks, # headers, HTML tags or other formatting characters
 - If mentioning an ESG score of "None", explain it means data isn't available
-- Write your response in English only
-- Use simple paragraph formatting with blank lines between paragraphs
 """
 
-    # Try multiple models with fallback
-    for attempt, model in enumerate([
-        "deepseek/deepseek-prover-v2:free",
-        "gpt-4o-mini",
-        "claude-3-sonnet-20240229"
-    ]):
+# Generic explanation used when every model fails
+FALLBACK_EXPLANATION = (
+    "Hello {name},\n\nBased on your questionnaire responses, we've identified your risk profile "
+    "as Level {risk_level} - {risk_label}. This risk level helps determine the balance of stability and growth potential in your investments.\n\n"
+    "We've selected investments matching your level {risk_level} profile across Europe, North America, and Emerging Markets. "
+    "Our recommendations are designed to balance risk and potential returns according to your {risk_label} profile.\n\n"
+    "Remember that your risk level {risk_level} - {risk_label} means {risk_desc}.\n\n"
+    "We wish you success on your investment journey!"
+)
+
+# Most generated explanations kept in memory for repeat profiles
+EXPLANATION_CACHE_SIZE = 256
+
+@st.cache_resource
+def get_explanation_cache():
+    """Generated explanations by prompt, kept across reruns and sessions"""
+    return {}
+
+# (question index, question text) pairs used to summarise the profile in prompts
+QUESTION_TEXTS = tuple((i, q["text"]) for i, q in enumerate(QUESTIONNAIRE))
+
+def explain_recommendations_with_gpt(profile, recommendations, name, grouped=None):
+    """Generate personalized explanation using AI with improved reliability and cleaning"""
+    for explanation in stream_explanation(profile, recommendations, name, grouped):
+        pass
+    return explanation
+
+def stream_explanation(profile, recommendations, name, grouped=None):
+    """Yield the cleaned explanation so far while the model writes it; the last value is the full text"""
+    risk_level, risk_label = profile_risk(profile)
+    
+    # Group recommendations by region, unless the caller already did
+    if grouped is None:
+        grouped = group_by_region(recommendations)
+    
+    # Format recommendations for the API
+    formatted_regions = []
+    for region in ["Europe", "North America", "Emerging Markets"]:
+        if region in grouped:
+            regional_recs = [
+                f"- {r['ticker']} ({PRODUCT_INFO.get(r['ticker'], (r['ticker'], r['asset_class']))[0]}), "
+                f"Asset Type: {r['asset_class']}, "
+                f"ESG Score: {r.get('esgScore', 'N/A')}, "
+                f"Overall Rating: {r.get('final_score', 0):.2f}"
+                for r in grouped[region][:3]
+            ]
+            formatted_regions.append(f"Region {region}:\n" + "\n".join(regional_recs))
+    
+    all_formatted_recs = "\n\n".join(formatted_regions)
+
+    # Include profile elements in the prompt, in questionnaire order
+    profile_summary = "\n".join(f"{q_text}: {profile[q_id]}" for q_id, q_text in QUESTION_TEXTS if q_id in profile)
+
+    # Prompt with clear instructions
+    prompt = EXPLANATION_PROMPT.format(name=name, risk_level=risk_level, risk_label=risk_label,
+                                       profile_summary=profile_summary, all_formatted_recs=all_formatted_recs)
+
+    # The prompt holds everything the answer depends on, so identical prompts share one answer
+    cache = get_explanation_cache()
+    if prompt in cache:
+        yield cache[prompt]
+        return
+
+    from openai import AuthenticationError, PermissionDeniedError
+    client = get_openai_client()
+
+    # Try multiple models with fallback; each call already retries transient errors with backoff.
+    # The answer is streamed, and the slot is held until the whole answer has arrived
+    for model in EXPLANATION_MODELS:
         try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful and friendly financial assistant for absolute beginners. Provide personalized, clear advice without financial jargon or any special formatting."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            with llm_slots:
+                stream = client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": "You are a helpful and friendly financial assistant for absolute beginners. Provide personalized, clear advice without financial jargon or any special formatting."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=EXPLANATION_MAX_TOKENS,
+                    temperature=LLM_TEMPERATURE,
+                    stream=True
+                )
+                parts = []
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        # Partial texts go around the cache, which is meant for finished ones
+                        yield clean_text_for_display.__wrapped__("".join(parts))
             
-            # Check if response has expected structure
-            if hasattr(response, 'choices') and len(response.choices) > 0 and hasattr(response.choices[0], 'message') and hasattr(response.choices[0].message, 'content'):
+            if parts:
                 # Clean up any markdown headers and formatting
-                result = clean_text_for_display(response.choices[0].message.content)
-                return result
+                result = clean_text_for_display("".join(parts))
+                if len(cache) >= EXPLANATION_CACHE_SIZE:
+                    cache.pop(next(iter(cache)), None)  # Drop the oldest explanation
+                cache[prompt] = result
+                yield result
+                return
+        except (AuthenticationError, PermissionDeniedError) as e:
+            # The API key is refused for every model, so the other models would fail the same way
+            print(f"API Error with model {model}: {str(e)}")
+            break
         except Exception as e:
             print(f"API Error with model {model}: {str(e)}")
-            if attempt >= 2:  # Last attempt
-                # Create a simple generic response
-                return (f"Hello {name},\n\nBased on your questionnaire responses, we've identified your risk profile "
-                       f"as Level {risk_level} - {risk_label}. This risk level helps determine the balance of stability and growth potential in your investments.\n\n"
-                       f"We've selected investments matching your level {risk_level} profile across Europe, North America, and Emerging Markets. "
-                       f"Our recommendations are designed to balance risk and potential returns according to your {risk_label} profile.\n\n"
-                       f"Remember that your risk level {risk_level} - {risk_label} means {get_risk_description(risk_level)}.\n\n"
-                       f"We wish you success on your investment journey!")
-    
-    # If we get here, all attempts failed
-    return (f"Hello {name},\n\nBased on your questionnaire responses, we've identified your risk profile "
-           f"as Level {risk_level} - {risk_label}. This risk level helps determine the balance of stability and growth potential in your investments.\n\n"
-           f"We've selected investments matching your level {risk_level} profile across Europe, North America, and Emerging Markets. "
-           f"Our recommendations are designed to balance risk and potential returns according to your {risk_label} profile.\n\n"
-           f"Remember that your risk level {risk_level} - {risk_label} means {get_risk_description(risk_level)}.\n\n"
-           f"We wish you success on your investment journey!")
-
-def generate_pdf_report_with_api(profile, recommendations, explanation_text, name="investment_report"):
-    """Generate fully personalized PDF report with improved structure and no redundant sections"""
-    risk_level = profile.get('risk_level', 3)
-    risk_label = RISK_LEVEL_NAME.get(risk_level, "Balanced")
-    
-    # Clean the explanation text to ensure no markdown or special characters
-    clean_explanation = clean_text_for_pdf(explanation_text)
     
-    # Generate action steps with API - this will be the ONLY next steps section
-    next_steps_prompt = f"""
+    # If we get here, all attempts failed: create a simple generic response
+    yield FALLBACK_EXPLANATION.format(name=name, risk_level=risk_level, risk_label=risk_label,
+                                      risk_desc=get_risk_description(risk_level))
+
+# Default action plan used when the API gives no usable steps
+DEFAULT_NEXT_STEPS = (
+    "1. Open a Brokerage Account: Choose a reputable online broker with low fees and an easy-to-use platform.",
+    "2. Fund Your Account: Transfer your initial investment funds and set up recurring deposits.",
+    "3. Purchase Recommended Securities: Buy the ETFs, bonds, or stocks suggested in this report.",
+    "4. Set Up Automatic Investments: Create a monthly investment plan to benefit from dollar-cost averaging.",
+    "5. Schedule Regular Reviews: Review your portfolio performance quarterly and adjust as needed."
+)
+
+# Prompt for the action plan of one risk level
+NEXT_STEPS_PROMPT = """
 You are a financial advisor helping a beginner with investment recommendations.
 Create a comprehensive action plan with 5 specific steps for a risk profile of Level {risk_level} - {risk_label}.
 Each step should be practical, actionable, and appropriate for a beginner investor.
@@ -259,43 +505,101 @@ EXAMPLES OF GOOD STYLE:
 
 Do not include ANY formatting, markdown, or special characters in your response.
 """
-    
+
+# A line of the generated action plan that starts a numbered step ("1." to "5.", or "1)")
+NEXT_STEP_RE = re.compile(r'\s*[1-5][.)]')
+
+# Action plans only depend on the risk level, so each one is generated once per process
+@st.cache_resource
+def get_next_steps_cache():
+    """Generated action plans by risk level, kept across reruns and sessions"""
+    return {}
+
+@st.cache_resource
+def get_api_executor():
+    """Worker threads for API calls that run while the page does other work"""
+    return ThreadPoolExecutor(max_workers=4)
+
+def get_next_steps(risk_level, risk_label, cache=None, client=None):
+    """Get the 5-step action plan for a risk level, generated with the API on first use"""
+    if cache is None:
+        cache = get_next_steps_cache()
+    if risk_level in cache:
+        return cache[risk_level]
+    if client is None:
+        client = get_openai_client()
+
+    next_steps_prompt = NEXT_STEPS_PROMPT.format(risk_level=risk_level, risk_label=risk_label)
+
     try:
-        next_steps_response = client.chat.completions.create(
+        next_steps_response = chat_completion(
+            client,
             model="deepseek/deepseek-prover-v2:free",
             messages=[
                 {"role": "system", "content": "You provide clear, concise financial advice for beginners without any formatting or special characters."},
                 {"role": "user", "content": next_steps_prompt}
-            ]
+            ],
+            max_tokens=NEXT_STEPS_MAX_TOKENS,
+            temperature=LLM_TEMPERATURE
         )
         next_steps_text = next_steps_response.choices[0].message.content
         # Clean the text and split into steps
         next_steps_text = clean_text_for_display(next_steps_text)
-        next_steps = [step.strip() for step in next_steps_text.split('\n') if step.strip() and any(digit in step[:2] for digit in "12345")]
-        
-        # If we didn't get valid steps, use improved default steps
-        if len(next_steps) < 3:
-            next_steps = [
-                "1. Open a Brokerage Account: Choose a reputable online broker with low fees and an easy-to-use platform.",
-                "2. Fund Your Account: Transfer your initial investment funds and set up recurring deposits.",
-                "3. Purchase Recommended Securities: Buy the ETFs, bonds, or stocks suggested in this report.",
-                "4. Set Up Automatic Investments: Create a monthly investment plan to benefit from dollar-cost averaging.",
-                "5. Schedule Regular Reviews: Review your portfolio performance quarterly and adjust as needed."
-            ]
+        next_steps = [step.strip() for step in next_steps_text.split('\n') if NEXT_STEP_RE.match(step)]
     except Exception as e:
         print(f"API Error for next steps: {str(e)}")
-        next_steps = [
-            "1. Open a Brokerage Account: Choose a reputable online broker with low fees and an easy-to-use platform.",
-            "2. Fund Your Account: Transfer your initial investment funds and set up recurring deposits.",
-            "3. Purchase Recommended Securities: Buy the ETFs, bonds, or stocks suggested in this report.",
-            "4. Set Up Automatic Investments: Create a monthly investment plan to benefit from dollar-cost averaging.",
-            "5. Schedule Regular Reviews: Review your portfolio performance quarterly and adjust as needed."
-        ]
+        return list(DEFAULT_NEXT_STEPS)
+
+    # If we didn't get valid steps, use improved default steps
+    if len(next_steps) < 3:
+        return list(DEFAULT_NEXT_STEPS)
+
+    cache[risk_level] = next_steps
+    return next_steps
+
+def request_next_steps(risk_level, risk_label):
+    """Start generating the action plan in the background and return a Future for it"""
+    # Cached resources are looked up here, on the script thread, not in the worker
+    return get_api_executor().submit(get_next_steps, risk_level, risk_label, get_next_steps_cache(),
+                                     get_openai_client())
+
+def enrich_recommendations(recs, esg_interested):
+    """Precompute the PDF text (title line, detail lines) for each recommendation"""
+    enriched = []
+    for rec in recs:
+        name, asset_type = PRODUCT_INFO.get(rec["ticker"], ("Unknown", rec["asset_class"]))
+        
+        details = [f"Type: {asset_type}"]
+        if esg_interested:
+            esg_display, esg_quality = format_esg_score(rec.get('esgScore'))
+            if esg_display == "N/A":
+                details.append("ESG Score: N/A - Data unavailable")
+            elif esg_quality:
+                details.append(f"ESG Score: {esg_display} ({esg_quality})")
+            else:
+                details.append(f"ESG Score: {esg_display}")
+        
+        rating = rec.get('final_score', 0)
+        details.append(f"Overall Rating: {rating:.2f} ({rating_label(rating)})")
+        enriched.append((f"{rec['ticker']} - {name}", "\n".join(details)))
+    return enriched
+
+def generate_pdf_report_with_api(profile, recommendations, explanation_text, name="investment_report", next_steps=None, grouped=None):
+    """Generate fully personalized PDF report with improved structure and no redundant sections"""
+    from fpdf import FPDF
+    risk_level, risk_label = profile_risk(profile)
+    
+    # Clean the explanation text to ensure no markdown or special characters
+    clean_explanation = clean_text_for_pdf(explanation_text)
+    
+    # Generate action steps with API - this will be the ONLY next steps section
+    if next_steps is None:
+        next_steps = get_next_steps(risk_level, risk_label)
     
     # Create the PDF
     pdf = FPDF()
     pdf.add_page()
-    pdf.add_font("DejaVu", "", "Fonts/DejaVuSans.ttf", uni=True)
+    pdf.add_font("DejaVu", "", "Fonts/DejaVuSans.ttf")
     
     # ----- TITLE PAGE -----
     pdf.set_font("DejaVu", size=18)
@@ -367,10 +671,12 @@ Do not include ANY formatting, markdown, or special characters in your response.
     pdf.cell(0, 10, txt="4. YOUR RECOMMENDED INVESTMENTS", ln=True, fill=True)
     pdf.ln(5)
 
-    # Group recommendations by region
-    grouped = defaultdict(list)
-    for r in recommendations:
-        grouped[r["region"]].append(r)
+    # The ESG line is only shown to users interested in ESG
+    esg_interested = profile.get(13, "") == "Yes"
+
+    # Group recommendations by region, unless the caller already did
+    if grouped is None:
+        grouped = group_by_region(recommendations)
 
     # Show recommendations by region
     for region_idx, region in enumerate(["Europe", "North America", "Emerging Markets"]):
@@ -388,12 +694,12 @@ Do not include ANY formatting, markdown, or special characters in your response.
             # Create consistent box sizing to ensure uniform appearance
             box_height = 30  # Fixed height for all recommendation boxes
             
-            for rec in grouped[region]:
+            for rec in enrich_recommendations(grouped[region], esg_interested):
                 # Check if we're close to the bottom of the page
                 if pdf.get_y() > 250:  # If less than 47 points left, add a new page
                     pdf.add_page()
                 
-                name, asset_type = PRODUCT_INFO.get(rec["ticker"], ("Unknown", rec["asset_class"]))
+                title, details = rec
                 
                 # Create a highlight box for each recommendation with consistent size
                 pdf.set_fill_color(248, 249, 250)  # Very light gray
@@ -405,48 +711,14 @@ Do not include ANY formatting, markdown, or special characters in your response.
                 
                 # Bold ticker and name
                 pdf.set_font("DejaVu", size=10)
-                pdf.cell(0, 6, f"{rec['ticker']} - {name}", ln=True)
-                
-                # Investment details with consistent indentation and spacing
-                pdf.set_xy(pdf.get_x() + 10, pdf.get_y())
-                pdf.cell(0, 6, f"Type: {asset_type}", ln=True)
-                
-                # Show ESG score if user is interested in ESG
-                esg_interested = profile.get(13, "") == "Yes"
-                if esg_interested:
-                    esg_value = rec.get('esgScore', 'N/A')
-                    pdf.set_xy(pdf.get_x() + 10, pdf.get_y())
-                    # Improved ESG score display
-                    if esg_value == 'None' or esg_value is None:
-                        pdf.cell(0, 6, f"ESG Score: N/A - Data unavailable", ln=True)
-                    else:
-                        # Format as integer if possible
-                        try:
-                            esg_display = f"{int(float(esg_value))}"
-                            # Add score quality indicator
-                            if float(esg_value) >= 80:
-                                esg_display += " (Excellent)"
-                            elif float(esg_value) >= 60:
-                                esg_display += " (Good)"
-                            elif float(esg_value) >= 40:
-                                esg_display += " (Average)"
-                            else:
-                                esg_display += " (Below Average)"
-                        except:
-                            esg_display = str(esg_value)
-                        pdf.cell(0, 6, f"ESG Score: {esg_display}", ln=True)
+                pdf.cell(0, 6, title, ln=True)
                 
-                # Rating display with meaning
-                pdf.set_xy(pdf.get_x() + 10, pdf.get_y())
-                rating = rec.get('final_score', 0)
-                rating_text = "Excellent Match" if rating >= 0.8 else (
-                            "Strong Match" if rating >= 0.6 else (
-                            "Good Match" if rating >= 0.4 else (
-                            "Acceptable Match" if rating >= 0.2 else "Minimal Match")))
-                pdf.cell(0, 6, f"Overall Rating: {rating:.2f} ({rating_text})", ln=True)
+                # Investment details (type, ESG score if wanted, rating) as one indented block
+                pdf.set_x(pdf.get_x() + 10)
+                pdf.multi_cell(0, 6, details)
                 
                 # Reset position after the box
-                pdf.set_xy(pdf.get_x(), box_y + box_height)
+                pdf.set_xy(pdf.l_margin, box_y + box_height)
                 pdf.ln(5)  # Add consistent spacing between boxes
 
     # ----- SECTION 5: ACTION PLAN (NEXT STEPS) -----
@@ -488,8 +760,8 @@ Do not include ANY formatting, markdown, or special characters in your response.
     # Generate the filename with user name to avoid confusion
     safe_name = name.replace(' ', '_').replace(',', '').replace('.', '')
     filename = f"{safe_name}_investment_report.pdf"
-    pdf.output(filename)
-    return filename
+    # Keep the PDF in memory; it is only ever attached to the email
+    return filename, bytes(pdf.output())
 
 # =========================================================================
 # 3. QUESTIONNAIRE EXPLANATIONS
@@ -514,14 +786,329 @@ question_explanations = {
     14: "'Investing with borrowed money' means investing more than you actually have - which increases both potential gains and risks."
 }
 
+# Short explanation of each risk level for the results page
+risk_explanations = {
+    1: "Very safety-oriented with a focus on capital preservation. Low risk, moderate returns.",
+    2: "Safety-oriented with a slight return orientation. Low to medium risk.",
+    3: "Balanced relationship between safety and return. Medium risk.",
+    4: "Return-oriented with increased risk tolerance. Higher risk for better return potential.",
+    5: "Strongly return-oriented with high risk tolerance. Highest risk for maximum return potential."
+}
+
+# Question headers only depend on the questionnaire, so they are rendered once
+QUESTION_HEADERS = [
+    f"### Question {i + 1} of {len(QUESTIONNAIRE)}\n"
+    f"**{q['text']}**\n\n"
+    f":gray[Choose the option that best fits you.]"
+    for i, q in enumerate(QUESTIONNAIRE)
+]
+
+def start_questionnaire():
+    """Keep the entered name and email, which opens the questionnaire, once both are filled in"""
+    name_input = st.session_state.name_input.strip()
+    email_input = st.session_state.email_input.strip()
+    if name_input and email_input:
+        st.session_state.name = name_input
+        st.session_state.email = email_input
+
+# Questions shown together in one form, so the questionnaire takes a few submits instead of one per question
+QUESTIONS_PER_PAGE = 5
+
+def previous_page():
+    """Go back one page of questions"""
+    st.session_state.current_question -= QUESTIONS_PER_PAGE
+
+def save_answers(first, last):
+    """Store the submitted answers of a page and go to the next page, or to the results after the last one"""
+    for question_index in range(first, last):
+        st.session_state.answers[question_index] = st.session_state[f"q_{question_index}_radio"]
+    if last < len(QUESTIONNAIRE):
+        st.session_state.current_question = last
+    else:
+        st.session_state.questionnaire_complete = True
+
+@st.fragment
+def questionnaire_page():
+    """One page of questions; its Back and Next submits rerun only this fragment"""
+    # The last submit completes the questionnaire, which needs the whole app to show the results
+    if st.session_state.questionnaire_complete:
+        st.rerun()
+    
+    # The page shows the questions first..last-1
+    first = st.session_state.current_question
+    last = min(first + QUESTIONS_PER_PAGE, len(QUESTIONNAIRE))
+    
+    # Progress bar, by page so the last page shows a full bar
+    progress = first // QUESTIONS_PER_PAGE / ((len(QUESTIONNAIRE) - 1) // QUESTIONS_PER_PAGE)
+    st.progress(progress)
+    
+    with st.form(key=f"question_form_{first}", clear_on_submit=True):
+        for current_question_index in range(first, last):
+            question = QUESTIONNAIRE[current_question_index]
+            with st.container(border=True):
+                st.markdown(QUESTION_HEADERS[current_question_index])
+                
+                # Show explanation for each question
+                st.info(question_explanations[current_question_index])
+                
+                # Options are shown by label but the radio returns the answer index directly
+                st.radio(
+                    "",
+                    range(len(question["options"])),
+                    format_func=question["options"].__getitem__,
+                    key=f"q_{current_question_index}_radio",
+                    index=st.session_state.answers.get(current_question_index, 0)
+                )
+        
+        # The buttons move on in callbacks, which run before the rerun the click triggers,
+        # so the next page is drawn straight away without a second st.rerun()
+        col1, col2 = st.columns([1,1])
+        with col1:
+            if first > 0:
+                st.form_submit_button("Back", on_click=previous_page)
+        with col2:
+            if last < len(QUESTIONNAIRE):
+                st.form_submit_button("Next", on_click=save_answers, args=(first, last))
+            else:
+                st.form_submit_button("Show Results", on_click=save_answers, args=(first, last))
+
+# The sections below the explanation are fragments: opening an expander or clicking a report
+# button reruns only that section instead of the whole results page
+@st.fragment
+def understanding_section():
+    """The expanders explaining the overall rating and the ESG scores"""
+    # Understanding section with detailed explanations
+    st.subheader("Understanding Your Results")
+    
+    # Expander 1: How the Overall Rating is Calculated
+    with st.expander("📈 How the Overall Rating is Calculated", key="exp_rating_help", on_change="rerun") as rating_help:
+        if rating_help.open:
+            st.markdown("""
+            ## Understanding the Overall Rating
+        
+            The overall rating (from 0 to 1) is a comprehensive score that measures how well each investment matches your specific needs and risk profile. 
+        
+            ### Factors Considered in the Rating
+        
+            Your rating is calculated based on several key financial metrics:
+        
+            1. **EV/EBITDA ratio**: A valuation metric that compares a company's enterprise value to its earnings before interest, taxes, depreciation, and amortization
+               - Lower values are generally better
+               - More heavily weighted for conservative investors
+           
+            2. **Free Cash Flow Yield**: Shows how much cash a company generates relative to its market capitalization
+               - Higher values are better
+               - More heavily weighted for growth-oriented investors
+           
+            3. **Volatility**: Measures how much the price of an investment fluctuates over time
+               - Lower volatility is preferred for conservative investors
+               - Higher volatility may be acceptable for aggressive investors seeking growth
+           
+            4. **ESG Score**: Evaluates environmental, social, and governance factors
+               - Given higher weight if you expressed interest in sustainable investing
+           
+            5. **Dividend Yield**: The annual dividend payment relative to the share price (especially for income-focused investors)
+               - Higher weight for those seeking regular income
+        
+            ### How Your Profile Affects the Rating
+        
+            The weighting of these factors changes based on your risk level:
+        
+            - **Defensive (Level 1)**: Emphasizes low volatility and stability metrics
+            - **Conservative (Level 2)**: Balances stability with modest growth potential 
+            - **Balanced (Level 3)**: Even distribution across growth and stability factors
+            - **Growth Tilt (Level 4)**: Emphasizes growth metrics with moderate stability
+            - **Aggressive (Level 5)**: Strongly emphasizes growth potential
+        
+            ### Understanding the Score Range
+        
+            - **0.80-1.00**: Excellent match for your profile
+            - **0.60-0.79**: Strong match
+            - **0.40-0.59**: Good match
+            - **0.20-0.39**: Acceptable match
+            - **0.00-0.19**: Minimal match
+        
+            ### Further Adjustments
+        
+            The system also makes adjustments based on:
+        
+            - Your investment objectives (wealth accumulation, income, or preservation)
+            - Your liquidity needs
+            - Your investment experience
+            - Regional characteristics (developed vs. emerging markets)
+            - Asset class characteristics (bonds, ETFs, stocks)
+        
+            The final result is a personalized rating that helps identify investments that best align with your unique financial situation and goals.
+            """)
+    
+    # Expander 2: Understanding the ESG Scores
+    with st.expander("🌿 Understanding the ESG Scores", key="exp_esg_help", on_change="rerun") as esg_help:
+        if esg_help.open:
+            st.markdown("""
+            ## Understanding the ESG Scores
+        
+            ESG scores range from 0-100 and measure how well a company or investment performs on:
+        
+            - **Environmental factors**: Climate impact, resource usage, pollution, etc.
+            - **Social factors**: Labor practices, community relations, human rights, etc.
+            - **Governance factors**: Board structure, executive compensation, ethics, etc.
+        
+            ### Score Ranges
+        
+            - **80-100**: Excellent ESG practices, industry leaders in sustainability
+            - **60-79**: Strong ESG practices, above average performance
+            - **40-59**: Average ESG performance, some strengths and weaknesses
+            - **20-39**: Below average ESG practices, significant room for improvement
+            - **0-19**: Poor ESG performance, substantial risks or issues
+        
+            ### When You See "N/A"
+        
+            If you see "N/A" for an ESG score, this does NOT mean the investment has poor ESG practices. It simply means:
+        
+            - ESG data is not available for this particular investment
+            - The company may not yet be covered by major ESG rating agencies
+            - The investment might be too new to have established ESG ratings
+            - For some ETFs or smaller companies, comprehensive ESG analysis may not exist
+        
+            This is common for smaller companies, certain regions, or specialized investments. In these cases, you may want to research the company's sustainability practices directly if ESG factors are important to you.
+        
+            ### Regional Context
+        
+            - European investments typically have higher ESG scores (average 60-75)
+            - North American investments have moderate ESG scores (average 55-65)
+            - Emerging Markets investments often have lower ESG scores (average 45-55)
+        
+            ### Asset Type Differences
+        
+            - ESG-focused ETFs generally have the highest scores (70-95)
+            - Green bonds often score well (65-90)
+            - Individual stocks vary widely based on company practices
+        
+            ### Why ESG Matters
+        
+            - **Risk management**: Companies with poor ESG practices may face regulatory issues, fines, or reputational damage
+            - **Long-term performance**: Some studies suggest companies with strong ESG practices may outperform over the long term
+            - **Impact alignment**: Allows you to invest according to your values
+            - **Future-proofing**: Companies addressing sustainability challenges may be better positioned for the future economy
+        
+            ### ESG Labels and Indicators
+        
+            Look for these indicators of strong ESG investments:
+            - Labeled as "ESG", "SRI" (Socially Responsible Investing), or "Sustainable"
+            - Part of sustainability indices (FTSE4Good, Dow Jones Sustainability Index)
+            - Certified B Corporations
+            - Green bond certification
+            """)
+
+@st.fragment
+def report_section(profile, recommendations, grouped):
+    """Status, download and resend of the emailed PDF report"""
+    # Once the report is built in the background, keep it and send it
+    report_future = st.session_state.report_future
+    if report_future is not None and report_future.done():
+        st.session_state.report_future = None
+        if report_future.exception() is not None:
+            st.error(f"Error creating report: {str(report_future.exception())}")
+            st.session_state.email_sent = False
+        else:
+            filename, pdf_bytes = report_future.result()
+            st.session_state.report_filename = filename
+            st.session_state.report_pdf = pdf_bytes
+            st.session_state.email_future = send_email_in_background(st.session_state.email, pdf_bytes, filename)
+
+    # Surface the result of an email sent in the background
+    email_future = st.session_state.email_future
+    if email_future is not None and email_future.done():
+        st.session_state.email_future = None
+        if email_future.exception() is not None:
+            st.error(f"Error sending email: {str(email_future.exception())}")
+            st.session_state.email_sent = False
+
+    # Check if email has already been sent
+    if st.session_state.email_sent:
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            if st.session_state.report_future is not None:
+                st.info("Your report is being prepared...")
+            elif st.session_state.email_future is not None:
+                st.info("Your report is being sent to your email...")
+            else:
+                st.success("Report has been sent to your email!")
+            st.info("If you don't see the email, please check your spam or junk folder. The email comes from 'Investmentguideprogramming@gmx.de'")
+        with col2:
+            if st.session_state.report_future is None:
+                # The same in-memory PDF that was attached to the email
+                st.download_button("Download Report", data=st.session_state.report_pdf,
+                                   file_name=st.session_state.report_filename, mime="application/pdf")
+                # Add resend button
+                st.button("Resend Email", disabled=st.session_state.email_future is not None, on_click=resend_report)
+        if st.session_state.report_future is not None or st.session_state.email_future is not None:
+            wait_for_report()
+    else:
+        st.button("Get Detailed Report by Email", on_click=request_report, args=(profile, recommendations, grouped))
+
+@st.fragment
+def beginner_tips():
+    """The expander with tips for beginners"""
+    with st.expander("📚 Helpful Tips for Beginners", key="exp_tips", on_change="rerun") as tips:
+        if tips.open:
+            st.markdown("""
+            ## Understanding Your Investment Options
+        
+            ### Types of Financial Assets
+        
+            #### ETFs (Exchange Traded Funds)
+            ETFs are baskets of securities traded on stock exchanges like individual stocks. They offer:
+            - **Diversification**: One ETF can contain hundreds of stocks or bonds
+            - **Low costs**: Generally lower fees than mutual funds
+            - **Flexibility**: Can be bought and sold throughout the trading day
+            - **Tax efficiency**: Typically generate fewer capital gains than mutual funds
+            - **Good for**: Most investors, especially beginners seeking diversification
+        
+            #### Bonds
+            Bonds are loans to governments or corporations that pay interest over time:
+            - **Income generation**: Regular interest payments (called coupons)
+            - **Lower volatility**: Generally more stable than stocks
+            - **Capital preservation**: Return of principal at maturity date
+            - **Different types**: Government bonds, corporate bonds, municipal bonds
+            - **Good for**: Conservative investors, retirees, or those seeking income
+        
+            #### Individual Stocks
+            Stocks represent ownership in specific companies:
+            - **Growth potential**: Can offer higher returns than ETFs or bonds
+            - **Higher risk**: More volatile with potentially larger losses
+            - **No diversification**: Performance tied to single companies
+            - **Control**: You choose specific companies to invest in
+            - **Good for**: More experienced investors willing to research companies
+        
+            ### ESG Investing
+            ESG stands for Environmental, Social, and Governance. ESG scores assess how well a company performs in these areas. Higher scores indicate better sustainability practices.
+        
+            ### How to Start Investing
+            1. Open an account with an online bank or broker
+            2. Transfer an amount you want to start with
+            3. Buy the recommended investments according to your risk profile
+            4. Invest regularly (e.g., monthly) a fixed amount (savings plan)
+        
+            ### Important Terms
+            - **Volatility**: How much an investment's price fluctuates (higher = more risk)
+            - **Yield**: Income returned on an investment (dividends, interest)
+            - **Diversification**: Spreading investments to reduce risk
+            - **Asset allocation**: How your money is divided between different types of investments
+        
+            ### Important Note
+            Investing involves risks. Inform yourself well and only invest money that you don't need in the short term.
+            """)
+
 # =========================================================================
 # 4. STREAMLIT APP SETUP
 # =========================================================================
 
 st.set_page_config(page_title="Beginner Investment Advisor", layout="wide")
 
-# CSS for a more user-friendly design
-st.markdown("""
+# CSS for a more user-friendly design; st.html adds a style-only block without
+# running it through the Markdown parser on every rerun
+st.html("""
 <style>
     .stButton button {
         font-size: 1.1em; 
@@ -531,26 +1118,8 @@ st.markdown("""
         font-size: 1.05em;
         margin-top: 0.5em;
     }
-    .question-container {
-        background-color: #f5f8ff; 
-        padding: 2em;
-        border-radius: 10px;
-        margin-bottom: 1.5em;
-    }
-    .result-box {
-        background-color: #f0f8f4;
-        padding: 1.5em;
-        border-radius: 8px;
-        margin-bottom: 1em;
-    }
-    .info-box {
-        background-color: #e1f5fe;
-        padding: 1em;
-        border-radius: 5px;
-        margin: 1em 0;
-    }
 </style>
-""", unsafe_allow_html=True)
+""")
 
 # Initialize session state
 if "name" not in st.session_state:
@@ -565,8 +1134,18 @@ if "email_sent" not in st.session_state:
     st.session_state.email_sent = False
 if "report_filename" not in st.session_state:
     st.session_state.report_filename = ""
+if "report_pdf" not in st.session_state:
+    st.session_state.report_pdf = None
+if "email_future" not in st.session_state:
+    st.session_state.email_future = None
+if "report_future" not in st.session_state:
+    st.session_state.report_future = None
 if "gpt_explanation" not in st.session_state:
     st.session_state.gpt_explanation = None
+if "next_steps_future" not in st.session_state:
+    st.session_state.next_steps_future = None
+if "results_key" not in st.session_state:
+    st.session_state.results_key = None
 
 # =========================================================================
 # 5. APP FLOW
@@ -575,76 +1154,26 @@ if "gpt_explanation" not in st.session_state:
 # Welcome screen
 if not st.session_state.name:
     st.title("Welcome to the Beginner Investment Advisor")
-    st.markdown("""
-    <div class="info-box">
-    <h3>🚀 Start Your Investment Journey</h3>
-    <p>This assistant will help you find the right entry into the world of investments. 
-    Through a few simple questions, we'll determine your risk profile and give you suitable investment recommendations.</p>
-    </div>
-    """, unsafe_allow_html=True)
+    with st.container(border=True):
+        st.markdown("""
+        ### 🚀 Start Your Investment Journey
+        This assistant will help you find the right entry into the world of investments. 
+        Through a few simple questions, we'll determine your risk profile and give you suitable investment recommendations.
+        """)
     
     with st.form(key="name_form", clear_on_submit=True):
-        name_input = st.text_input("Please enter your name:")
-        email_input = st.text_input("And your email address for your personal report:")
+        st.text_input("Please enter your name:", key="name_input")
+        st.text_input("And your email address for your personal report:", key="email_input")
         
         # Add email verification message
         st.info("⚠️ Please double-check your email address for accuracy. Your personalized investment report will be sent to this address.")
         
-        start_clicked = st.form_submit_button("Start")
-        if start_clicked and name_input.strip() and email_input.strip():
-            st.session_state.name = name_input.strip()
-            st.session_state.email = email_input.strip()
-            st.rerun()
+        st.form_submit_button("Start", on_click=start_questionnaire)
 
 # Questionnaire
 elif not st.session_state.questionnaire_complete:
     st.title(f"Welcome, {st.session_state.name}!")
-    current_question_index = st.session_state.current_question
-    question = QUESTIONNAIRE[current_question_index]
-    
-    # Progress bar
-    progress = (current_question_index) / (len(QUESTIONNAIRE) - 1)
-    st.progress(progress)
-    
-    with st.form(key=f"question_form_{current_question_index}", clear_on_submit=True):
-        st.markdown(f"""
-        <div class="question-container">
-            <span style='font-size:1.5em; font-weight:bold; color:#1a237e;'>Question {current_question_index + 1} of {len(QUESTIONNAIRE)}</span><br>
-            <span style='font-size:1.2em; font-weight:bold; color:#222;'>{question['text']}</span>
-            <p style='font-size:0.9em; color:#666; margin-top:0.5em;'>Choose the option that best fits you.</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Show explanation for each question
-        st.info(question_explanations[current_question_index])
-        
-        answer = st.radio(
-            "",
-            question["options"],
-            key=f"q_{current_question_index}_radio",
-            index=st.session_state.answers.get(current_question_index, 0)
-        )
-        
-        col1, col2 = st.columns([1,1])
-        with col1:
-            back_clicked = st.form_submit_button("Back") if current_question_index > 0 else False
-        with col2:
-            if current_question_index + 1 < len(QUESTIONNAIRE):
-                next_clicked = st.form_submit_button("Next")
-            else:
-                next_clicked = st.form_submit_button("Show Results")
-                
-        if back_clicked:
-            st.session_state.current_question -= 1
-            st.rerun()
-        elif next_clicked:
-            st.session_state.answers[current_question_index] = question["options"].index(answer)
-            if current_question_index + 1 < len(QUESTIONNAIRE):
-                st.session_state.current_question += 1
-                st.rerun()
-            else:
-                st.session_state.questionnaire_complete = True
-                st.rerun()
+    questionnaire_page()
 
 # Show results
 else:
@@ -656,31 +1185,37 @@ else:
     # Reset stored explanation if restarting the questionnaire
     if "restart_questionnaire" in st.session_state and st.session_state.restart_questionnaire:
         st.session_state.gpt_explanation = None
+        st.session_state.next_steps_future = None
         st.session_state.restart_questionnaire = False
     
-    # Loading animation
-    with st.spinner("⏳ Please be patient while we prepare your personalized results..."):
-        try:
-            # First get the recommendation results
-            result = generate_full_recommendation(st.session_state.answers)
-            
-            # Then create the profile with the accurate risk level from the recommendation
-            profile = map_answers_to_profile(answers)
-            profile["risk_level"] = result["risk_level"]  # Use the enhanced risk level
-            risk_level = result["risk_level"]  # For display
-        except Exception as e:
-            st.error(f"Error generating recommendations: {str(e)}")
-            st.stop()
+    # The results are only worked out again when the answers changed, so reruns from
+    # buttons and expanders on this page go straight to drawing it
+    results_key = answers_key(answers)
+    if st.session_state.results_key != results_key:
+        # Loading animation
+        with st.spinner("⏳ Please be patient while we prepare your personalized results..."):
+            try:
+                # First get the recommendation results
+                result, grouped, cards_html = cached_full_recommendation(results_key)
+                
+                # Then create the profile with the accurate risk level from the recommendation
+                profile = map_answers_to_profile(answers)
+                profile["risk_level"] = result["risk_level"]  # Use the enhanced risk level
+                profile["risk_label"] = RISK_LEVEL_NAME.get(result["risk_level"], "Balanced")
+            except Exception as e:
+                st.error(f"Error generating recommendations: {str(e)}")
+                st.stop()
+        st.session_state.results = (result, grouped, cards_html, profile)
+        st.session_state.results_key = results_key
     
+    result, grouped, cards_html, profile = st.session_state.results
+    risk_level = result["risk_level"]  # For display
     primary = result["primary_etf"]
     recommendations = result["recommendations"]
     
     # Overview in a box container
-    st.markdown("""
-    <div class="result-box">
-        <h2>📊 Your Investment Summary</h2>
-    </div>
-    """, unsafe_allow_html=True)
+    with st.container(border=True):
+        st.markdown("## 📊 Your Investment Summary")
     
     # Risk profile with explanation
     col1, col2 = st.columns([1, 2])
@@ -692,78 +1227,38 @@ else:
         """)
     with col2:
         # Simple explanation of the risk profile
-        risk_explanations = {
-            1: "Very safety-oriented with a focus on capital preservation. Low risk, moderate returns.",
-            2: "Safety-oriented with a slight return orientation. Low to medium risk.",
-            3: "Balanced relationship between safety and return. Medium risk.",
-            4: "Return-oriented with increased risk tolerance. Higher risk for better return potential.",
-            5: "Strongly return-oriented with high risk tolerance. Highest risk for maximum return potential."
-        }
         st.info(risk_explanations.get(risk_level, "No risk profile available."))
     
-    # Sort and display recommendations by region
-    grouped = defaultdict(list)
-    for r in recommendations:
-        grouped[r["region"]].append(r)
-    
-    # Show recommendations by region
-    for region in ["Europe", "North America", "Emerging Markets"]:
-        if region in grouped:
-            st.subheader(f"🌍 {region}")
-            for r in grouped[region]:
-                name, asset_type = PRODUCT_INFO.get(r["ticker"], ("Unknown", r["asset_class"]))
-                
-                # Improved ESG score display
-                esg_score = r.get('esgScore', 'N/A')
-                esg_display, esg_rating = format_esg_score(esg_score)
-                if esg_rating:
-                    esg_display = f"{esg_display} ({esg_rating})"
-                esg_tooltip = "Data not available" if esg_display == "N/A" else "Environmental, Social, and Governance score (0-100)"
-                
-                # Format the overall rating with clear meaning
-                rating_score = r.get('final_score', 0)
-                if rating_score >= 0.8:
-                    rating_display = f"{rating_score:.2f} (Excellent Match)"
-                elif rating_score >= 0.6:
-                    rating_display = f"{rating_score:.2f} (Strong Match)"
-                elif rating_score >= 0.4:
-                    rating_display = f"{rating_score:.2f} (Good Match)"
-                elif rating_score >= 0.2:
-                    rating_display = f"{rating_score:.2f} (Acceptable Match)"
-                else:
-                    rating_display = f"{rating_score:.2f} (Minimal Match)"
-                
-                # Create the recommendation box with improved display
-                st.markdown(f"""
-                <div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin-bottom: 10px;">
-                    <h4 style="margin-top: 0;">{r["ticker"]} - {name}</h4>
-                    <p><strong>Type:</strong> {asset_type}</p>
-                    <p><strong>ESG Score:</strong> {esg_display} <span style="font-size: 0.9em; color: #6c757d;">({esg_tooltip})</span></p>
-                    <p><strong>Overall Rating:</strong> {rating_display}</p>
-                </div>
-                """, unsafe_allow_html=True)
+    # Show recommendations by region, all headers and boxes as one markdown block
+    st.markdown(cards_html, unsafe_allow_html=True)
     
     # Generate the personalized explanation with better error handling
+    # The PDF's action plan is a separate API call; start it now so it runs alongside the explanation
+    if st.session_state.next_steps_future is None:
+        st.session_state.next_steps_future = request_next_steps(risk_level, profile["risk_label"])
+
     try:
-        with st.spinner("Generating your personalized explanation..."):
-            # Use saved explanation or generate a new one
-            if st.session_state.gpt_explanation is None:
-                gpt_text = explain_recommendations_with_gpt(profile, recommendations, st.session_state.name)
-                # Clean the text before storing it
-                gpt_text = clean_text_for_display(gpt_text)
-                st.session_state.gpt_explanation = gpt_text
-            else:
-                gpt_text = st.session_state.gpt_explanation
-            
         st.subheader("Your Personalized Investment Explanation")
         
-        # Use st.write which handles newlines properly without HTML
-        st.write(gpt_text)
+        # Use saved explanation or generate a new one, showing it while it is being written
+        # (st.write handles newlines properly without HTML)
+        if st.session_state.gpt_explanation is None:
+            explanation_box = st.empty()
+            with st.spinner("Generating your personalized explanation..."):
+                for gpt_text in stream_explanation(profile, recommendations, st.session_state.name, grouped):
+                    explanation_box.write(gpt_text)
+            # Clean the text before storing it
+            gpt_text = clean_text_for_display(gpt_text)
+            st.session_state.gpt_explanation = gpt_text
+            explanation_box.write(gpt_text)
+        else:
+            gpt_text = st.session_state.gpt_explanation
+            st.write(gpt_text)
     except Exception as e:
         st.error(f"Error generating explanation: {str(e)}")
         # Generate a fallback explanation
         if st.session_state.gpt_explanation is None:
-            gpt_text = explain_recommendations_with_gpt(profile, recommendations, st.session_state.name)
+            gpt_text = explain_recommendations_with_gpt(profile, recommendations, st.session_state.name, grouped)
             gpt_text = clean_text_for_display(gpt_text)
             st.session_state.gpt_explanation = gpt_text
         else:
@@ -771,212 +1266,16 @@ else:
         st.write(gpt_text)
     
     # Understanding section with detailed explanations
-    st.subheader("Understanding Your Results")
-    
-    # Expander 1: How the Overall Rating is Calculated
-    with st.expander("📈 How the Overall Rating is Calculated"):
-        st.markdown("""
-        ## Understanding the Overall Rating
-        
-        The overall rating (from 0 to 1) is a comprehensive score that measures how well each investment matches your specific needs and risk profile. 
-        
-        ### Factors Considered in the Rating
-        
-        Your rating is calculated based on several key financial metrics:
-        
-        1. **EV/EBITDA ratio**: A valuation metric that compares a company's enterprise value to its earnings before interest, taxes, depreciation, and amortization
-           - Lower values are generally better
-           - More heavily weighted for conservative investors
-           
-        2. **Free Cash Flow Yield**: Shows how much cash a company generates relative to its market capitalization
-           - Higher values are better
-           - More heavily weighted for growth-oriented investors
-           
-        3. **Volatility**: Measures how much the price of an investment fluctuates over time
-           - Lower volatility is preferred for conservative investors
-           - Higher volatility may be acceptable for aggressive investors seeking growth
-           
-        4. **ESG Score**: Evaluates environmental, social, and governance factors
-           - Given higher weight if you expressed interest in sustainable investing
-           
-        5. **Dividend Yield**: The annual dividend payment relative to the share price (especially for income-focused investors)
-           - Higher weight for those seeking regular income
-        
-        ### How Your Profile Affects the Rating
-        
-        The weighting of these factors changes based on your risk level:
-        
-        - **Defensive (Level 1)**: Emphasizes low volatility and stability metrics
-        - **Conservative (Level 2)**: Balances stability with modest growth potential 
-        - **Balanced (Level 3)**: Even distribution across growth and stability factors
-        - **Growth Tilt (Level 4)**: Emphasizes growth metrics with moderate stability
-        - **Aggressive (Level 5)**: Strongly emphasizes growth potential
-        
-        ### Understanding the Score Range
-        
-        - **0.80-1.00**: Excellent match for your profile
-        - **0.60-0.79**: Strong match
-        - **0.40-0.59**: Good match
-        - **0.20-0.39**: Acceptable match
-        - **0.00-0.19**: Minimal match
-        
-        ### Further Adjustments
-        
-        The system also makes adjustments based on:
-        
-        - Your investment objectives (wealth accumulation, income, or preservation)
-        - Your liquidity needs
-        - Your investment experience
-        - Regional characteristics (developed vs. emerging markets)
-        - Asset class characteristics (bonds, ETFs, stocks)
-        
-        The final result is a personalized rating that helps identify investments that best align with your unique financial situation and goals.
-        """)
-    
-    # Expander 2: Understanding the ESG Scores
-    with st.expander("🌿 Understanding the ESG Scores"):
+    understanding_section()
+
+    # Email and PDF report with resend option
+    with st.container(border=True):
         st.markdown("""
-        ## Understanding the ESG Scores
-        
-        ESG scores range from 0-100 and measure how well a company or investment performs on:
-        
-        - **Environmental factors**: Climate impact, resource usage, pollution, etc.
-        - **Social factors**: Labor practices, community relations, human rights, etc.
-        - **Governance factors**: Board structure, executive compensation, ethics, etc.
-        
-        ### Score Ranges
-        
-        - **80-100**: Excellent ESG practices, industry leaders in sustainability
-        - **60-79**: Strong ESG practices, above average performance
-        - **40-59**: Average ESG performance, some strengths and weaknesses
-        - **20-39**: Below average ESG practices, significant room for improvement
-        - **0-19**: Poor ESG performance, substantial risks or issues
-        
-        ### When You See "N/A"
-        
-        If you see "N/A" for an ESG score, this does NOT mean the investment has poor ESG practices. It simply means:
-        
-        - ESG data is not available for this particular investment
-        - The company may not yet be covered by major ESG rating agencies
-        - The investment might be too new to have established ESG ratings
-        - For some ETFs or smaller companies, comprehensive ESG analysis may not exist
-        
-        This is common for smaller companies, certain regions, or specialized investments. In these cases, you may want to research the company's sustainability practices directly if ESG factors are important to you.
-        
-        ### Regional Context
-        
-        - European investments typically have higher ESG scores (average 60-75)
-        - North American investments have moderate ESG scores (average 55-65)
-        - Emerging Markets investments often have lower ESG scores (average 45-55)
-        
-        ### Asset Type Differences
-        
-        - ESG-focused ETFs generally have the highest scores (70-95)
-        - Green bonds often score well (65-90)
-        - Individual stocks vary widely based on company practices
-        
-        ### Why ESG Matters
-        
-        - **Risk management**: Companies with poor ESG practices may face regulatory issues, fines, or reputational damage
-        - **Long-term performance**: Some studies suggest companies with strong ESG practices may outperform over the long term
-        - **Impact alignment**: Allows you to invest according to your values
-        - **Future-proofing**: Companies addressing sustainability challenges may be better positioned for the future economy
-        
-        ### ESG Labels and Indicators
-        
-        Look for these indicators of strong ESG investments:
-        - Labeled as "ESG", "SRI" (Socially Responsible Investing), or "Sustainable"
-        - Part of sustainability indices (FTSE4Good, Dow Jones Sustainability Index)
-        - Certified B Corporations
-        - Green bond certification
+        ### 📧 Get Your Detailed Report
+        We can send you a detailed report with all recommendations and explanations via email.
         """)
     
-    # Email and PDF report with resend option
-    st.markdown("""
-    <div class="info-box">
-        <h3>📧 Get Your Detailed Report</h3>
-        <p>We can send you a detailed report with all recommendations and explanations via email.</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Check if email has already been sent
-    if st.session_state.email_sent:
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            st.success("Report has been sent to your email!")
-            st.info("If you don't see the email, please check your spam or junk folder. The email comes from 'Investmentguideprogramming@gmx.de'")
-        with col2:
-            # Add resend button
-            if st.button("Resend Email"):
-                try:
-                    send_email_with_pdf(st.session_state.email, st.session_state.report_filename)
-                    st.success("Report has been resent to your email!")
-                except Exception as e:
-                    st.error(f"Error sending email: {str(e)}")
-    else:
-        if st.button("Get Detailed Report by Email"):
-            try:
-                # Use the stored explanation rather than generating a new one
-                explanation_text = st.session_state.gpt_explanation
-                
-                # Use the improved PDF generator
-                filename = generate_pdf_report_with_api(profile, recommendations, explanation_text, st.session_state.name)
-                send_email_with_pdf(st.session_state.email, filename)
-                st.success("Report sent to your email!")
-                
-                # Save state for resend option
-                st.session_state.email_sent = True
-                st.session_state.report_filename = filename
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error sending email: {str(e)}")
-    
-    # Helpful Tips for Beginners 
-    with st.expander("📚 Helpful Tips for Beginners"):
-        st.markdown("""
-        ## Understanding Your Investment Options
-        
-        ### Types of Financial Assets
-        
-        #### ETFs (Exchange Traded Funds)
-        ETFs are baskets of securities traded on stock exchanges like individual stocks. They offer:
-        - **Diversification**: One ETF can contain hundreds of stocks or bonds
-        - **Low costs**: Generally lower fees than mutual funds
-        - **Flexibility**: Can be bought and sold throughout the trading day
-        - **Tax efficiency**: Typically generate fewer capital gains than mutual funds
-        - **Good for**: Most investors, especially beginners seeking diversification
-        
-        #### Bonds
-        Bonds are loans to governments or corporations that pay interest over time:
-        - **Income generation**: Regular interest payments (called coupons)
-        - **Lower volatility**: Generally more stable than stocks
-        - **Capital preservation**: Return of principal at maturity date
-        - **Different types**: Government bonds, corporate bonds, municipal bonds
-        - **Good for**: Conservative investors, retirees, or those seeking income
-        
-        #### Individual Stocks
-        Stocks represent ownership in specific companies:
-        - **Growth potential**: Can offer higher returns than ETFs or bonds
-        - **Higher risk**: More volatile with potentially larger losses
-        - **No diversification**: Performance tied to single companies
-        - **Control**: You choose specific companies to invest in
-        - **Good for**: More experienced investors willing to research companies
-        
-        ### ESG Investing
-        ESG stands for Environmental, Social, and Governance. ESG scores assess how well a company performs in these areas. Higher scores indicate better sustainability practices.
-        
-        ### How to Start Investing
-        1. Open an account with an online bank or broker
-        2. Transfer an amount you want to start with
-        3. Buy the recommended investments according to your risk profile
-        4. Invest regularly (e.g., monthly) a fixed amount (savings plan)
-        
-        ### Important Terms
-        - **Volatility**: How much an investment's price fluctuates (higher = more risk)
-        - **Yield**: Income returned on an investment (dividends, interest)
-        - **Diversification**: Spreading investments to reduce risk
-        - **Asset allocation**: How your money is divided between different types of investments
-        
-        ### Important Note
-        Investing involves risks. Inform yourself well and only invest money that you don't need in the short term.
-        """)
\ No newline at end of file
+    report_section(profile, recommendations, grouped)
+
+    # Helpful Tips for Beginners
+    beginner_tips()
\ No newline at end of file